@@ -0,0 +1,20 @@
+import json
+
+import pytest
+from django.core.management import call_command
+
+from posts.benchmark import VIEWS
+
+# Запуск: pytest -m benchmark; объёмы здесь маленькие, для проверки стенда.
+pytestmark = [pytest.mark.benchmark, pytest.mark.django_db]
+
+
+def test_benchmark_command_reports_every_view(tmp_path):
+    output = tmp_path / 'bench.json'
+    call_command('benchmark', seed=True, users=30, posts=300, follows=5,
+                 comments=100, requests=3, warmup=1, output=str(output))
+    report = json.loads(output.read_text(encoding='utf-8'))
+    assert set(report['views']) == set(VIEWS)
+    for metrics in report['views'].values():
+        assert metrics['p50_ms'] <= metrics['p99_ms']
+        assert metrics['queries'] > 0
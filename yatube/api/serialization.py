@@ -0,0 +1,109 @@
+"""Потоковая сериализация строк values() в JSON.
+
+Объекты моделей не создаются: запрос отдаёт словари только нужных
+колонок, и каждая строка сразу пишется в ответ. Набор полей задаётся
+параметром ?fields=id,text (sparse fieldsets).
+"""
+import json
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+
+from posts.paginators import encode_token
+
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'post': 'post_id',
+}
+GROUP_FIELDS = {
+    'id': 'id',
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+}
+
+
+class FieldError(ValueError):
+    pass
+
+
+def image_url(name):
+    return default_storage.url(name) if name else None
+
+
+CONVERTERS = {'image': image_url}
+
+
+def select_fields(value, available):
+    """{имя в ответе: колонка values()} для ?fields= или всех полей."""
+    if not value:
+        return dict(available)
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = sorted(set(names) - set(available))
+    if unknown:
+        raise FieldError(f'Неизвестные поля: {", ".join(unknown)}')
+    return {name: available[name] for name in names}
+
+
+def columns(fields, *required):
+    """Колонки запроса: выбранные поля и нужные для курсора."""
+    return sorted(set(fields.values()) | set(required))
+
+
+def project(row, fields):
+    item = {}
+    for name, column in fields.items():
+        value = row[column]
+        converter = CONVERTERS.get(name)
+        item[name] = converter(value) if converter else value
+    return item
+
+
+def dumps(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def post_cursor(row):
+    return encode_token(row['pub_date'].isoformat(), row['id'])
+
+
+def id_cursor(row):
+    return encode_token(row['id'])
+
+
+def stream_page(rows, fields, limit, cursor):
+    """Куски JSON {"results": [...], "next": курсор или null}.
+
+    rows должны содержать limit + 1 строку, если есть продолжение.
+    """
+    yield '{"results": ['
+    last = None
+    for number, row in enumerate(rows):
+        if number == limit:
+            yield f'], "next": {dumps(cursor(last))}}}'
+            return
+        if number:
+            yield ','
+        yield dumps(project(row, fields))
+        last = row
+    yield '], "next": null}'
+
+
+def stream_list(rows, fields):
+    yield '['
+    for number, row in enumerate(rows):
+        if number:
+            yield ','
+        yield dumps(project(row, fields))
+    yield ']'
@@ -0,0 +1,105 @@
+import json
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+def read_json(response):
+    return json.loads(b''.join(response.streaming_content))
+
+
+class ApiViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api-group', description='Описание')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Запись {number}',
+                                group=cls.group if number % 2 else None)
+            for number in range(5)
+        ]
+        Comment.objects.create(post=cls.posts[0], author=cls.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+
+    def get(self, name, data=None, **kwargs):
+        return self.client.get(reverse(f'api:{name}', kwargs=kwargs), data)
+
+    def test_cursor_walks_whole_feed(self):
+        seen, cursor = [], None
+        while True:
+            data = {'limit': 2}
+            if cursor:
+                data['after'] = cursor
+            response = self.get('post_list', data)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            page = read_json(response)
+            seen.extend(item['id'] for item in page['results'])
+            cursor = page['next']
+            if cursor is None:
+                break
+        self.assertEqual(seen, [post.pk for post in reversed(self.posts)])
+
+    def test_sparse_fieldsets(self):
+        page = read_json(self.get('post_list', {'fields': 'id,author'}))
+        self.assertEqual(page['results'][0],
+                         {'id': self.posts[-1].pk, 'author': 'writer'})
+        response = self.get('post_list', {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_multi_get_keeps_requested_order(self):
+        ids = [self.posts[1].pk, self.posts[3].pk, 999999]
+        with self.assertNumQueries(1):
+            page = read_json(self.get(
+                'post_list', {'ids': ','.join(map(str, ids)),
+                              'fields': 'id'}))
+        self.assertEqual([item['id'] for item in page['results']], ids[:2])
+        self.assertEqual(self.get('post_list', {'ids': 'a,b'}).status_code,
+                         400)
+
+    def test_post_detail_with_comments(self):
+        data = read_json(self.get(
+            'post_detail', {'comment_fields': 'author,text'},
+            post_id=self.posts[0].pk))
+        self.assertEqual(data['post']['text'], 'Запись 0')
+        self.assertEqual(data['comments'],
+                         [{'author': 'reader', 'text': 'Комментарий'}])
+        missing = self.get('post_detail', post_id=999999)
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(json.loads(missing.content)['error'], 'Не найдено')
+
+    def test_rows_are_read_before_response_is_returned(self):
+        """Поток не ходит в базу после выхода из middleware."""
+        responses = [
+            self.get('post_list'),
+            self.get('group_list'),
+            self.get('post_detail', post_id=self.posts[0].pk),
+        ]
+        with self.assertNumQueries(0):
+            for response in responses:
+                read_json(response)
+
+    def test_group_and_profile_feeds(self):
+        groups = read_json(self.get('group_list'))
+        self.assertEqual(groups['results'][0]['slug'], 'api-group')
+        group_feed = read_json(self.get('group_posts', slug='api-group'))
+        self.assertEqual(len(group_feed['results']), 2)
+        profile_feed = read_json(self.get('profile_posts',
+                                          username='writer'))
+        self.assertEqual(len(profile_feed['results']), 5)
+        profile = json.loads(self.get('profile', username='writer').content)
+        self.assertEqual(profile['stats']['posts_count'], 5)
+        self.assertEqual(profile['stats']['followers_count'], 1)
+
+    def test_follow_feed_requires_login(self):
+        self.assertEqual(self.get('follow_feed').status_code, 401)
+        self.client.force_login(self.reader)
+        feed = read_json(self.get('follow_feed', {'fields': 'id'}))
+        self.assertEqual(len(feed['results']), 5)
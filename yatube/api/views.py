@@ -0,0 +1,186 @@
+"""Версионированный JSON API только для чтения.
+
+Ответы собираются из values() без объектов моделей и шаблонов
+и пишутся в поток по строке; сами строки читаются ещё внутри view.
+Списки пагинируются курсором ?after= (keyset, как в CursorPaginator),
+?fields= выбирает поля, ?ids= отдаёт записи пачкой.
+"""
+from functools import wraps
+
+from django.forms.models import model_to_dict
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from posts import stats
+from posts.models import AuthorStats, Comment, Group, Post, User
+from posts.paginators import decode_cursor, decode_token, older_than
+
+from .serialization import (COMMENT_FIELDS, GROUP_FIELDS, POST_FIELDS,
+                            FieldError, columns, dumps, id_cursor,
+                            post_cursor, project, select_fields, stream_list,
+                            stream_page)
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_IDS = 100
+PROFILE_FIELDS = ('id', 'username', 'first_name', 'last_name')
+
+
+def error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def api_view(view):
+    """Ошибки запроса превращаются в JSON вместо HTML-страниц."""
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except FieldError as exc:
+            return error(str(exc), 400)
+        except Http404:
+            return error('Не найдено', 404)
+    return wrapper
+
+
+def streaming(chunks):
+    # Поток дочитывается после выхода из middleware, где уже нет
+    # маршрутизации реплик и метрик, поэтому в chunks только готовые
+    # строки: ограниченная страница выбирается до ответа.
+    return StreamingHttpResponse(chunks, content_type='application/json')
+
+
+def get_limit(request):
+    value = request.GET.get('limit')
+    if value is None:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise FieldError('limit должен быть числом')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def get_ids(value):
+    try:
+        ids = [int(pk) for pk in value.split(',') if pk.strip()]
+    except ValueError:
+        raise FieldError('ids должен быть списком чисел')
+    if len(ids) > MAX_IDS:
+        raise FieldError(f'Не больше {MAX_IDS} ids за запрос')
+    return list(dict.fromkeys(ids))
+
+
+def posts_page(request, queryset):
+    """Страница ленты записей с курсором по (pub_date, id)."""
+    fields = select_fields(request.GET.get('fields'), POST_FIELDS)
+    limit = get_limit(request)
+    queryset = queryset.order_by('-pub_date', '-id')
+    after = request.GET.get('after')
+    if after:
+        position = decode_cursor(after)
+        if position is None:
+            raise FieldError('Неверный курсор')
+        queryset = older_than(queryset, position)
+    rows = queryset.values(*columns(fields, 'id', 'pub_date'))
+    return streaming(stream_page(list(rows[:limit + 1]), fields, limit,
+                                 post_cursor))
+
+
+def posts_by_ids(request, value):
+    """Записи по списку id в порядке запроса; пропавшие пропускаются."""
+    fields = select_fields(request.GET.get('fields'), POST_FIELDS)
+    ids = get_ids(value)
+    rows = {row['id']: row for row in Post.objects.filter(
+        pk__in=ids).values(*columns(fields, 'id', 'pub_date'))}
+    found = [rows[pk] for pk in ids if pk in rows]
+    return streaming(stream_page(found, fields, MAX_IDS, post_cursor))
+
+
+@api_view
+def post_list(request):
+    ids = request.GET.get('ids')
+    if ids is not None:
+        return posts_by_ids(request, ids)
+    return posts_page(request, Post.objects.all())
+
+
+@api_view
+def post_detail(request, post_id):
+    fields = select_fields(request.GET.get('fields'), POST_FIELDS)
+    comment_fields = select_fields(request.GET.get('comment_fields'),
+                                   COMMENT_FIELDS)
+    post = Post.objects.filter(pk=post_id).values(
+        *columns(fields, 'id')).first()
+    if post is None:
+        raise Http404
+    comments = list(Comment.objects.filter(post_id=post_id).order_by(
+        'pub_date', 'id').values(*columns(comment_fields)))
+
+    def chunks():
+        yield f'{{"post": {dumps(project(post, fields))}, "comments": '
+        yield from stream_list(comments, comment_fields)
+        yield '}'
+    return streaming(chunks())
+
+
+@api_view
+def group_list(request):
+    fields = select_fields(request.GET.get('fields'), GROUP_FIELDS)
+    limit = get_limit(request)
+    queryset = Group.objects.order_by('id')
+    after = request.GET.get('after')
+    if after:
+        position = decode_token(after, 1)
+        if position is None or not position[0].isdigit():
+            raise FieldError('Неверный курсор')
+        queryset = queryset.filter(pk__gt=int(position[0]))
+    rows = queryset.values(*columns(fields, 'id'))
+    return streaming(stream_page(list(rows[:limit + 1]), fields, limit,
+                                 id_cursor))
+
+
+@api_view
+def group_posts(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'id', flat=True).first()
+    if group_id is None:
+        raise Http404
+    return posts_page(request, Post.objects.filter(group_id=group_id))
+
+
+def author_id(username):
+    pk = User.objects.filter(username=username).values_list(
+        'id', flat=True).first()
+    if pk is None:
+        raise Http404
+    return pk
+
+
+@api_view
+def profile(request, username):
+    user = User.objects.filter(username=username).values(
+        *PROFILE_FIELDS).first()
+    if user is None:
+        raise Http404
+    counters = list(stats.COUNTERS)
+    counts = AuthorStats.objects.filter(author_id=user['id']).values(
+        *counters).first()
+    if counts is None:
+        counts = model_to_dict(stats.reconcile(user['id']), fields=counters)
+    return JsonResponse({**user, 'stats': counts})
+
+
+@api_view
+def profile_posts(request, username):
+    return posts_page(request,
+                      Post.objects.filter(author_id=author_id(username)))
+
+
+@api_view
+def follow_feed(request):
+    if not request.user.is_authenticated:
+        return error('Нужна авторизация', 401)
+    return posts_page(request, Post.objects.filter(
+        author__following__user=request.user))
@@ -0,0 +1,339 @@
+"""Бэкенды кэша с учётом попаданий в метриках запроса."""
+import pickle
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from . import metrics
+
+MISSING = object()
+# Ключ в журнале инвалидаций, означающий clear().
+CLEAR_ALL = '*'
+
+
+class InstrumentedLocMemCache(LocMemCache):
+    """LocMemCache, который считает попадания и промахи запроса."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, MISSING, version)
+        if value is MISSING:
+            metrics.record_cache(0, 1)
+            return default
+        metrics.record_cache(1, 0)
+        return value
+
+
+class MemoryLRU:
+    """L1: LRU в памяти процесса, ограниченный суммарным размером."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            data, expires = item
+            if expires is not None and expires <= time.time():
+                self._remove(key)
+                return None
+            self.items.move_to_end(key)
+            return data
+
+    def set(self, key, data, expires):
+        if len(data) > self.max_bytes:
+            self.delete(key)
+            return
+        with self.lock:
+            self._remove(key)
+            self.items[key] = (data, expires)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self.items)))
+
+    def delete(self, key):
+        with self.lock:
+            self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        item = self.items.pop(key, None)
+        if item is not None:
+            self.size -= len(item[0])
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кэш: L1 в процессе перед общим L2 в файле SQLite.
+
+    Все процессы пишут в один файл LOCATION. Каждая запись и удаление
+    попадают ещё и в журнал инвалидаций; процессы раз в POLL_INTERVAL
+    секунд читают из журнала новые ключи и выбрасывают их из своего L1.
+    Свои записи процесс пропускает: его L1 уже обновлён.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.l1 = MemoryLRU(int(options.get('L1_MAX_BYTES', 16 * 2 ** 20)))
+        self.l1_timeout = float(options.get('L1_TIMEOUT', 60))
+        self.poll_interval = float(options.get('POLL_INTERVAL', 1))
+        self.log_retention = float(options.get('LOG_RETENTION', 600))
+        self.origin = uuid.uuid4().hex
+        self.local = threading.local()
+        self.poll_lock = threading.Lock()
+        self.last_poll = 0
+        self._create_tables()
+        # Всё, что записано до старта, L1 и так не видел.
+        self.last_seen = self._connection().execute(
+            'SELECT MAX(id) FROM cache_invalidations').fetchone()[0] or 0
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+        return connection
+
+    def _create_tables(self):
+        self._connection().executescript('''
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL);
+            CREATE TABLE IF NOT EXISTS cache_invalidations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT NOT NULL, origin TEXT NOT NULL, created REAL);
+        ''')
+
+    def _l1_expires(self, expires):
+        limit = time.time() + self.l1_timeout
+        return limit if expires is None else min(expires, limit)
+
+    def _broadcast(self, connection, keys):
+        now = time.time()
+        connection.executemany(
+            'INSERT INTO cache_invalidations (key, origin, created) '
+            'VALUES (?, ?, ?)', [(key, self.origin, now) for key in keys])
+
+    def _poll(self):
+        """Выбрасывает из L1 ключи, изменённые другими процессами."""
+        now = time.time()
+        if now - self.last_poll < self.poll_interval:
+            return
+        with self.poll_lock:
+            self.last_poll = now
+            connection = self._connection()
+            first = connection.execute(
+                'SELECT MIN(id) FROM cache_invalidations').fetchone()[0]
+            rows = connection.execute(
+                'SELECT id, key, origin FROM cache_invalidations '
+                'WHERE id > ? ORDER BY id', [self.last_seen]).fetchall()
+            if first is not None and first > self.last_seen + 1:
+                # Журнал успели подрезать: неизвестно, что пропущено.
+                self.l1.clear()
+            for pk, key, origin in rows:
+                if origin == self.origin:
+                    continue
+                if key == CLEAR_ALL:
+                    self.l1.clear()
+                else:
+                    self.l1.delete(key)
+            if rows:
+                self.last_seen = rows[-1][0]
+
+    def _record(self, tier):
+        metrics.record_cache_tier(tier)
+        if tier == 'miss':
+            metrics.record_cache(0, 1)
+        else:
+            metrics.record_cache(1, 0)
+
+    def _l2_get(self, keys):
+        if not keys:
+            return {}
+        placeholders = ', '.join('?' * len(keys))
+        rows = self._connection().execute(
+            f'SELECT key, value, expires FROM cache_entries '
+            f'WHERE key IN ({placeholders}) '
+            f'AND (expires IS NULL OR expires > ?)',
+            [*keys, time.time()]).fetchall()
+        found = {}
+        for key, data, expires in rows:
+            self.l1.set(key, data, self._l1_expires(expires))
+            found[key] = data
+        return found
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        self._poll()
+        made = {}
+        for key in keys:
+            made_key = self.make_key(key, version)
+            self.validate_key(made_key)
+            made[made_key] = key
+        found = {}
+        missing = []
+        for made_key in made:
+            data = self.l1.get(made_key)
+            if data is None:
+                missing.append(made_key)
+            else:
+                self._record('l1')
+                found[made_key] = data
+        from_l2 = self._l2_get(missing)
+        for made_key in missing:
+            self._record('l2' if made_key in from_l2 else 'miss')
+        found.update(from_l2)
+        return {made[made_key]: pickle.loads(data)
+                for made_key, data in found.items()}
+
+    def _store(self, connection, key, value, timeout):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self.get_backend_timeout(timeout)
+        connection.execute(
+            'INSERT OR REPLACE INTO cache_entries (key, value, expires) '
+            'VALUES (?, ?, ?)', [key, data, expires])
+        self.l1.set(key, data, self._l1_expires(expires))
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        made = {}
+        for key, value in data.items():
+            made_key = self.make_key(key, version)
+            self.validate_key(made_key)
+            made[made_key] = value
+        connection = self._connection()
+        with self._transaction(connection):
+            for made_key, value in made.items():
+                self._store(connection, made_key, value, timeout)
+            self._broadcast(connection, made)
+            self._cull(connection)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        connection = self._connection()
+        with self._transaction(connection):
+            row = connection.execute(
+                'SELECT 1 FROM cache_entries WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                [key, time.time()]).fetchone()
+            if row is not None:
+                return False
+            self._store(connection, key, value, timeout)
+            self._broadcast(connection, [key])
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        made_key = self.make_key(key, version)
+        self.validate_key(made_key)
+        connection = self._connection()
+        with self._transaction(connection):
+            row = connection.execute(
+                'SELECT value, expires FROM cache_entries WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                [made_key, time.time()]).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            connection.execute(
+                'UPDATE cache_entries SET value = ? WHERE key = ?',
+                [data, made_key])
+            self.l1.set(made_key, data, self._l1_expires(row[1]))
+            self._broadcast(connection, [made_key])
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        connection = self._connection()
+        with self._transaction(connection):
+            updated = connection.execute(
+                'UPDATE cache_entries SET expires = ? WHERE key = ?',
+                [self.get_backend_timeout(timeout), key]).rowcount
+            self.l1.delete(key)
+            self._broadcast(connection, [key])
+        return bool(updated)
+
+    def has_key(self, key, version=None):
+        return self.get(key, MISSING, version) is not MISSING
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        made = [self.make_key(key, version) for key in keys]
+        for key in made:
+            self.validate_key(key)
+            self.l1.delete(key)
+        connection = self._connection()
+        with self._transaction(connection):
+            connection.executemany(
+                'DELETE FROM cache_entries WHERE key = ?',
+                [(key,) for key in made])
+            self._broadcast(connection, made)
+
+    def clear(self):
+        self.l1.clear()
+        connection = self._connection()
+        with self._transaction(connection):
+            connection.execute('DELETE FROM cache_entries')
+            self._broadcast(connection, [CLEAR_ALL])
+
+    def _cull(self, connection):
+        """Чистит просроченное, лишние записи и старый журнал."""
+        if random.random() > 1 / self._cull_frequency:
+            return
+        now = time.time()
+        connection.execute(
+            'DELETE FROM cache_entries WHERE expires <= ?', [now])
+        connection.execute(
+            'DELETE FROM cache_invalidations WHERE created < ?',
+            [now - self.log_retention])
+        count = connection.execute(
+            'SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+        if count > self._max_entries:
+            connection.execute(
+                'DELETE FROM cache_entries WHERE key IN ('
+                'SELECT key FROM cache_entries '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                [count - self._max_entries])
+
+    @contextmanager
+    def _transaction(self, connection):
+        # IMMEDIATE сразу берёт блокировку записи: incr и add атомарны
+        # между процессами.
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def close(self, **kwargs):
+        # Соединения живут в потоках и переиспользуются между запросами.
+        pass
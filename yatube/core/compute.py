@@ -0,0 +1,88 @@
+"""Вычисление значений для кэша без «эффекта толпы».
+
+get_or_compute() хранит значение вместе с версией, временем расчёта и
+моментом, до которого оно свежее. Пересчитывает значение только тот,
+кто взял блокировку через cache.add, остальные в это время отдают
+прежнее (stale-while-revalidate). Незадолго до истечения значение
+пересчитывается заранее с вероятностью, растущей по мере приближения
+срока (XFetch), поэтому горячий ключ не истекает у всех разом.
+"""
+import math
+import random
+import time
+
+from django.core.cache import caches
+
+LOCK_KEY = 'compute_lock:{}'
+# Сколько держится блокировка, если вычисляющий процесс упал.
+LOCK_TIMEOUT = 30
+# Сколько ждать чужого расчёта, когда прежнего значения нет совсем.
+WAIT_TIMEOUT = 2
+WAIT_STEP = 0.05
+BETA = 1.0
+
+
+def expires_early(computed_in, fresh_until, beta=BETA):
+    """Решает, пора ли пересчитать значение раньше срока (XFetch)."""
+    jitter = -computed_in * beta * math.log(1 - random.random())
+    return time.time() + jitter >= fresh_until
+
+
+def _store(cache, key, compute, timeout, version, grace):
+    started = time.perf_counter()
+    value = compute()
+    computed_in = time.perf_counter() - started
+    if timeout is None:
+        fresh_until, lifetime = math.inf, None
+    else:
+        fresh_until = time.time() + timeout
+        lifetime = timeout + grace
+    cache.set(key, (value, version, computed_in, fresh_until), lifetime)
+    return value
+
+
+def _recompute(cache, key, compute, timeout, version, grace):
+    try:
+        return _store(cache, key, compute, timeout, version, grace)
+    finally:
+        cache.delete(LOCK_KEY.format(key))
+
+
+def _wait(cache, key, version):
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None and entry[1] == version:
+            return entry
+    return None
+
+
+def get_or_compute(key, compute, timeout, version=None, grace=None,
+                   beta=BETA, using='default'):
+    """Значение ключа или результат compute(), посчитанный одним процессом.
+
+    timeout — сколько значение свежее, grace — сколько после этого его
+    ещё можно отдавать, пока идёт пересчёт (по умолчанию timeout).
+    Значение с другой version считается устаревшим, но тоже отдаётся,
+    пока его пересчитывают.
+    """
+    cache = caches[using]
+    grace = timeout if grace is None else grace
+    lock_key = LOCK_KEY.format(key)
+    entry = cache.get(key)
+    if entry is not None:
+        value, entry_version, computed_in, fresh_until = entry
+        if entry_version == version and not expires_early(
+                computed_in, fresh_until, beta):
+            return value
+        if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+            return value
+        return _recompute(cache, key, compute, timeout, version, grace)
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        return _recompute(cache, key, compute, timeout, version, grace)
+    entry = _wait(cache, key, version)
+    if entry is not None:
+        return entry[0]
+    # Держатель блокировки не успел: считаем сами, но ключ не трогаем.
+    return compute()
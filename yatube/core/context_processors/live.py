@@ -0,0 +1,6 @@
+from django.conf import settings
+
+
+def live_updates(request):
+    """Адрес сервера SSE; пустой — живые обновления выключены."""
+    return {'sse_url': settings.SSE_URL}
@@ -0,0 +1,61 @@
+"""Персональные «дырки» в общих для всех страницах.
+
+Страница рендерится один раз для всех и кэшируется, а небольшие
+персональные куски (шапка с именем, кнопка подписки, форма
+комментария) оставляются в ней маркерами. Перед отдачей маркеры
+заменяются фрагментами, отрисованными для текущего пользователя.
+Те же фрагменты можно получить отдельно через /personal/.
+"""
+import re
+
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+MARKER = '<!--hole:{}:{}-->'
+MARKER_RE = re.compile(r'<!--hole:(\w+):([^>]*)-->')
+
+_renderers = {}
+
+
+def register(name):
+    """Регистрирует функцию (request, *args) -> HTML под именем name."""
+    def decorator(func):
+        _renderers[name] = func
+        return func
+    return decorator
+
+
+def marker(name, args):
+    return MARKER.format(name, '|'.join(str(arg) for arg in args))
+
+
+def render(name, request, args):
+    renderer = _renderers.get(name)
+    if renderer is None:
+        return ''
+    return mark_safe(renderer(request, *args))
+
+
+def parse(value):
+    """Разбирает «name:arg1|arg2» в (name, [args])."""
+    name, _, args = value.partition(':')
+    return name, args.split('|') if args else []
+
+
+def fill(content, request):
+    """Заменяет маркеры в HTML фрагментами для request.user."""
+    def replace(match):
+        name, args = parse(f'{match.group(1)}:{match.group(2)}')
+        return render(name, request, args)
+    return MARKER_RE.sub(replace, content)
+
+
+@register('header_user')
+def header_user(request):
+    return render_to_string('includes/header_user.html', request=request)
+
+
+@register('switcher')
+def switcher(request, active):
+    return render_to_string(
+        'posts/includes/switcher.html', {active: True}, request=request)
@@ -0,0 +1,171 @@
+"""Фоновые задачи без внешнего брокера.
+
+Очередь — таблица Job в основной базе. Представления и сигналы ставят
+задачу через enqueue() и сразу отвечают, команда run_jobs выбирает
+готовые задачи и выполняет их в пуле потоков или процессов. Упавшая
+задача повторяется с экспоненциальной задержкой, одинаковые задачи
+с общим dedup_key не копятся в очереди. Выполненные задачи удаляются,
+в таблице остаются только ожидающие и окончательно упавшие.
+
+При settings.JOBS_EAGER задача выполняется сразу в месте постановки.
+"""
+import json
+import logging
+import random
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (IntegrityError, OperationalError,
+                       close_old_connections, transaction)
+from django.utils import timezone
+
+from . import sqlite
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+BACKOFF_BASE = 2
+BACKOFF_MAX = 60 * 60
+LOCK_RETRIES = 5
+LOCK_DELAY = 0.02
+
+
+def task(name=None, max_attempts=5):
+    """Регистрирует функцию как задачу и добавляет ей .enqueue()."""
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        REGISTRY[task_name] = func
+
+        def enqueue_task(*args, dedup_key=None, delay=0, **kwargs):
+            return enqueue(task_name, *args, dedup_key=dedup_key,
+                           delay=delay, max_attempts=max_attempts, **kwargs)
+        func.task_name = task_name
+        func.enqueue = enqueue_task
+        return func
+    return decorator
+
+
+def enqueue(name, *args, dedup_key=None, delay=0, max_attempts=5,
+            **kwargs):
+    """Ставит задачу в очередь; возвращает Job или None при eager."""
+    if settings.JOBS_EAGER:
+        # Не внутри пачки писателя SQLite: задача не держит блокировку.
+        sqlite.after_commit(lambda: REGISTRY[name](*args, **kwargs))
+        return None
+    fields = {
+        'name': name,
+        'payload': json.dumps({'args': args, 'kwargs': kwargs}),
+        'max_attempts': max_attempts,
+        'run_at': timezone.now() + timedelta(seconds=delay),
+    }
+    if dedup_key is None:
+        return Job.objects.create(**fields)
+    try:
+        with transaction.atomic():
+            job, _ = Job.objects.get_or_create(
+                dedup_key=dedup_key, status=Job.QUEUED, defaults=fields)
+    except IntegrityError:
+        # Такую же задачу только что поставил другой процесс.
+        job = Job.objects.filter(
+            dedup_key=dedup_key, status=Job.QUEUED).first()
+    return job
+
+
+def retry_locked(func, *args, **kwargs):
+    """Повторяет короткую служебную запись очереди, пока база занята.
+
+    Иначе воркер падал бы, а выполненная задача оставалась RUNNING
+    до конца аренды и выполнялась повторно.
+    """
+    for attempt in range(LOCK_RETRIES):
+        try:
+            return func(*args, **kwargs)
+        except OperationalError:
+            if attempt == LOCK_RETRIES - 1:
+                raise
+            time.sleep(LOCK_DELAY * 2 ** attempt)
+
+
+def backoff(attempts):
+    """Задержка перед повтором: 2, 4, 8… секунд с разбросом."""
+    delay = min(BACKOFF_BASE ** attempts, BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.5)
+
+
+def release_stale(lease=None):
+    """Возвращает в очередь задачи упавших воркеров."""
+    lease = settings.JOBS_LEASE if lease is None else lease
+    deadline = timezone.now() - timedelta(seconds=lease)
+    return Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=deadline).update(
+        status=Job.QUEUED, claim='', locked_at=None)
+
+
+def claim(limit):
+    """Забирает до limit готовых задач; безопасно для многих воркеров.
+
+    Условный UPDATE по статусу пропускает задачи, которые между
+    выборкой и обновлением забрал кто-то другой. Возвращает пары
+    (id, токен): только владелец токена выполняет и меняет задачу.
+    """
+    now = timezone.now()
+    ids = list(Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+               .order_by('run_at', 'id').values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    Job.objects.filter(pk__in=ids, status=Job.QUEUED).update(
+        status=Job.RUNNING, claim=token, locked_at=now)
+    return [(pk, token) for pk in Job.objects.filter(
+        claim=token).values_list('id', flat=True)]
+
+
+def execute(job_id, token):
+    """Выполняет взятую задачу; вызывается в потоке или процессе пула.
+
+    Возвращает None, если задачу по истечении аренды вернули в очередь
+    (и, возможно, её уже взял другой воркер с другим токеном).
+    """
+    close_old_connections()
+    try:
+        owned = Job.objects.filter(pk=job_id, status=Job.RUNNING,
+                                   claim=token)
+        job = retry_locked(owned.first)
+        if job is None:
+            return None
+        payload = json.loads(job.payload)
+        try:
+            REGISTRY[job.name](*payload['args'], **payload['kwargs'])
+        except Exception:
+            retry_locked(fail, job, token, traceback.format_exc())
+            return False
+        retry_locked(owned.delete)
+        return True
+    finally:
+        close_old_connections()
+
+
+def fail(job, token, error):
+    attempts = job.attempts + 1
+    fields = {'attempts': attempts, 'last_error': error, 'claim': '',
+              'locked_at': None}
+    if attempts >= job.max_attempts or job.name not in REGISTRY:
+        fields['status'] = Job.FAILED
+        logger.error('Задача %s #%s упала окончательно:\n%s',
+                     job.name, job.pk, error)
+    else:
+        fields['status'] = Job.QUEUED
+        fields['run_at'] = timezone.now() + timedelta(
+            seconds=backoff(attempts))
+    owned = Job.objects.filter(pk=job.pk, claim=token)
+    try:
+        with transaction.atomic():
+            owned.update(**fields)
+    except IntegrityError:
+        # Пока задача выполнялась, такую же поставили заново — та и
+        # выполнит работу, повтор не нужен.
+        owned.delete()
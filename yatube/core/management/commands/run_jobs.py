@@ -0,0 +1,61 @@
+import time
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import jobs
+
+POOLS = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в пуле потоков или процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.JOBS_WORKERS,
+            help='размер пула')
+        parser.add_argument(
+            '--pool', choices=POOLS, default='thread',
+            help='потоки или процессы')
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='пауза между опросами пустой очереди, секунд')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='выполнить готовые задачи и выйти')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        # Процессы наследуют открытые соединения при fork, их надо закрыть.
+        connections.close_all()
+        done = failed = 0
+        running = set()
+        with POOLS[options['pool']](max_workers=workers) as pool:
+            while True:
+                # Новые задачи берутся, как только освобождается место,
+                # а не после всей пачки: медленная задача не держит пул.
+                if len(running) < workers:
+                    jobs.retry_locked(jobs.release_stale)
+                    running |= {
+                        pool.submit(jobs.execute, job_id, token)
+                        for job_id, token in jobs.retry_locked(
+                            jobs.claim, workers - len(running))}
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+                finished, running = wait(
+                    running, timeout=options['poll'],
+                    return_when=FIRST_COMPLETED)
+                for future in finished:
+                    ok = future.result()
+                    if ok:
+                        done += 1
+                    elif ok is not None:
+                        failed += 1
+        self.stdout.write(f'Выполнено: {done}, с ошибкой: {failed}')
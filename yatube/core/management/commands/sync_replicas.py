@@ -0,0 +1,39 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core import routers
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную SQLite-базу в файлы реплик для чтения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help='файлы реплик; по умолчанию — из DATABASE_REPLICAS')
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Копирование поддерживается только для SQLite')
+        aliases = {
+            settings.DATABASES[alias]['NAME']: alias
+            for alias in settings.DATABASE_REPLICAS}
+        paths = options['paths'] or list(aliases)
+        primary.ensure_connection()
+        for path in paths:
+            started = time.time()
+            # Онлайн-бэкап даёт согласованный снимок без остановки записи.
+            target = sqlite3.connect(path)
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            if path in aliases:
+                # Снимок содержит всё, что записано до started.
+                routers.mark_synced(aliases[path], started)
+            self.stdout.write(f'Реплика обновлена: {path}')
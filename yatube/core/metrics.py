@@ -0,0 +1,194 @@
+"""Метрики производительности запросов, собираемые внутри процесса.
+
+Middleware заводит на каждый запрос RequestStats, в который пишут
+обёртка выполнения SQL, шаблонный бэкенд и кэш. По завершении запроса
+значения попадают в гистограммы, сгруппированные по имени URL.
+"""
+import re
+import threading
+from collections import Counter
+
+TIME_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+_local = threading.local()
+_lock = threading.Lock()
+_views = {}
+# Чтения многоуровневого кэша по месту находки: l1, l2 или miss.
+_cache_tiers = Counter()
+
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s")
+IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+
+def fingerprint(sql):
+    """SQL без конкретных значений: одинаковые запросы сливаются в один."""
+    sql = LITERAL_RE.sub('?', sql)
+    return IN_LIST_RE.sub('(...)', sql)
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Пары (граница, накопленное число) как в формате Prometheus."""
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class ViewMetrics:
+
+    def __init__(self):
+        self.duration = Histogram(TIME_BUCKETS)
+        self.sql_time = Histogram(TIME_BUCKETS)
+        self.sql_count = Histogram(COUNT_BUCKETS)
+        self.template_time = Histogram(TIME_BUCKETS)
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+class RequestStats:
+
+    def __init__(self):
+        self.queries = []
+        self.template_ms = 0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def sql_ms(self):
+        return sum(duration for _, duration in self.queries)
+
+    def slowest_fingerprints(self, limit=5):
+        totals, counts = Counter(), Counter()
+        for sql, duration in self.queries:
+            key = fingerprint(sql)
+            totals[key] += duration
+            counts[key] += 1
+        return [(key, counts[key], totals[key])
+                for key, _ in totals.most_common(limit)]
+
+
+def start():
+    _local.stats = RequestStats()
+    return _local.stats
+
+
+def stop():
+    _local.stats = None
+
+
+def current():
+    return getattr(_local, 'stats', None)
+
+
+def record_cache(hits, misses):
+    stats = current()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+def record_cache_tier(tier):
+    with _lock:
+        _cache_tiers[tier] += 1
+
+
+def cache_tiers():
+    """Доли чтений кэша, обслуженных каждым уровнем."""
+    with _lock:
+        total = sum(_cache_tiers.values())
+        return {tier: {'reads': count, 'rate': round(count / total, 4)}
+                for tier, count in _cache_tiers.items()}
+
+
+def observe(view_name, stats, duration_ms):
+    with _lock:
+        view = _views.setdefault(view_name, ViewMetrics())
+        view.duration.observe(duration_ms)
+        view.sql_time.observe(stats.sql_ms)
+        view.sql_count.observe(len(stats.queries))
+        view.template_time.observe(stats.template_ms)
+        view.cache_hits += stats.cache_hits
+        view.cache_misses += stats.cache_misses
+
+
+def reset():
+    with _lock:
+        _views.clear()
+        _cache_tiers.clear()
+
+
+def snapshot():
+    """Сводка по представлениям для JSON-ответа."""
+    with _lock:
+        return {
+            name: {
+                'requests': view.duration.count,
+                'total_ms': round(view.duration.sum, 3),
+                'sql_ms': round(view.sql_time.sum, 3),
+                'sql_queries': view.sql_count.sum,
+                'template_ms': round(view.template_time.sum, 3),
+                'cache_hits': view.cache_hits,
+                'cache_misses': view.cache_misses,
+            }
+            for name, view in _views.items()
+        }
+
+
+HISTOGRAMS = (
+    ('yatube_request_duration_ms', 'duration', 'Время ответа'),
+    ('yatube_sql_duration_ms', 'sql_time', 'Время SQL за запрос'),
+    ('yatube_sql_queries', 'sql_count', 'Число SQL-запросов за запрос'),
+    ('yatube_template_duration_ms', 'template_time', 'Время рендеринга'),
+)
+
+
+def prometheus():
+    """Все метрики в текстовом формате Prometheus."""
+    lines = []
+    with _lock:
+        views = sorted(_views.items())
+        for metric, attr, help_text in HISTOGRAMS:
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} histogram')
+            for name, view in views:
+                histogram = getattr(view, attr)
+                for bound, total in histogram.cumulative():
+                    lines.append(
+                        f'{metric}_bucket{{view="{name}",le="{bound}"}} '
+                        f'{total}')
+                lines.append(f'{metric}_sum{{view="{name}"}} '
+                             f'{round(histogram.sum, 3)}')
+                lines.append(f'{metric}_count{{view="{name}"}} '
+                             f'{histogram.count}')
+        for metric, attr in (('yatube_cache_hits_total', 'cache_hits'),
+                             ('yatube_cache_misses_total', 'cache_misses')):
+            lines.append(f'# TYPE {metric} counter')
+            for name, view in views:
+                lines.append(
+                    f'{metric}{{view="{name}"}} {getattr(view, attr)}')
+        if _cache_tiers:
+            metric = 'yatube_cache_tier_reads_total'
+            lines.append(f'# TYPE {metric} counter')
+            for tier, count in sorted(_cache_tiers.items()):
+                lines.append(f'{metric}{{tier="{tier}"}} {count}')
+    return '\n'.join(lines) + '\n'
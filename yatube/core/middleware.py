@@ -0,0 +1,86 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, routers
+
+logger = logging.getLogger('yatube.performance')
+
+
+class PerformanceMiddleware:
+    """Замеряет время ответа, SQL, рендеринг и кэш по имени URL."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = metrics.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(
+                        self.record_query(stats)))
+                response = self.get_response(request)
+        finally:
+            metrics.stop()
+        duration_ms = (time.perf_counter() - started) * 1000
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        metrics.observe(view_name, stats, duration_ms)
+        if duration_ms >= settings.PERFORMANCE_SLOW_REQUEST_MS:
+            self.log_slow(request, view_name, stats, duration_ms)
+        return response
+
+    @staticmethod
+    def record_query(stats):
+        def wrapper(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                stats.queries.append(
+                    (sql, (time.perf_counter() - started) * 1000))
+        return wrapper
+
+    @staticmethod
+    def log_slow(request, view_name, stats, duration_ms):
+        lines = [
+            f'  {count}x {total:.1f} ms: {sql}'
+            for sql, count, total in stats.slowest_fingerprints()
+        ]
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.1f ms, SQL %d шт. / %.1f ms, '
+            'шаблоны %.1f ms\n%s', request.method, request.path, view_name,
+            duration_ms, len(stats.queries), stats.sql_ms, stats.template_ms,
+            '\n'.join(lines))
+
+
+class ReplicaPinMiddleware:
+    """Держит запись и следующие за ней чтения на актуальных базах."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            since = float(request.COOKIES[settings.REPLICA_PIN_COOKIE])
+        except (KeyError, ValueError):
+            since = None
+        unsafe = request.method not in routers.SAFE_METHODS
+        routers.start_request(pinned=unsafe, since=since)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.finish_request()
+        # Служебные записи при чтении (пересчёт счётчиков) не привязывают.
+        if wrote and unsafe:
+            # Запись уже зафиксирована: её содержит любой снимок позже.
+            response.set_cookie(settings.REPLICA_PIN_COOKIE,
+                                repr(time.time()),
+                                max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
@@ -5,9 +5,53 @@ class CreatedTimeModel(models.Model):
 
     pub_date = models.DateTimeField(
         'Дата создания',
-        auto_now_add=True
+        auto_now_add=True,
+        db_index=True
     )
 
     class Meta:
         # Это абстрактная модель:
         abstract = True
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди на таблице базы (core.jobs)."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Задача', max_length=200)
+    payload = models.TextField('Аргументы', default='{}')
+    dedup_key = models.CharField(
+        'Ключ дедупликации', max_length=200, blank=True, null=True)
+    status = models.CharField(
+        'Статус', max_length=10, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        'Предел попыток', default=5)
+    run_at = models.DateTimeField('Запустить после')
+    claim = models.CharField(max_length=32, blank=True, db_index=True)
+    locked_at = models.DateTimeField('Взята в работу', null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Поставлена', auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Выборка готовых к запуску задач воркером.
+            models.Index(fields=['status', 'run_at'],
+                         name='job_status_run_at_idx'),
+        ]
+        constraints = [
+            # Одинаковая задача стоит в очереди не больше одного раза.
+            models.UniqueConstraint(
+                fields=['dedup_key'], condition=models.Q(status='queued'),
+                name='unique_queued_job'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
@@ -0,0 +1,104 @@
+"""Чтение с реплик, запись в основную базу.
+
+Реплики перечислены в settings.DATABASE_REPLICAS. На реплики уходят
+только чтения внутри запроса: команды и фоновые задачи читают основную
+базу, как и пользователи с сессиями (PRIMARY_APPS). После записи кука
+REPLICA_PIN_COOKIE хранит её время, и чтения пользователя идут только
+на реплики, обновлённые позже (sync_replicas отмечает время снимка),
+а пока таких нет — в основную базу. Кука живёт не дольше
+REPLICA_PIN_SECONDS.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = threading.local()
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Пользователи и сессии читаются там же, куда пишутся.
+PRIMARY_APPS = ('auth', 'sessions')
+SYNCED_KEY = 'replica_synced:{}'
+
+
+def mark_synced(alias, when):
+    """Запоминает время снимка, с которого обновлена реплика."""
+    cache.set(SYNCED_KEY.format(alias), when, None)
+
+
+def start_request(pinned=False, since=None):
+    """since — время последней записи пользователя из куки."""
+    _state.active = True
+    _state.pinned = pinned
+    _state.primary = False
+    _state.since = since
+    _state.fresh = None
+    _state.wrote = False
+
+
+def finish_request():
+    """Сбрасывает состояние и говорит, была ли в запросе запись."""
+    wrote = getattr(_state, 'wrote', False)
+    _state.active = _state.pinned = _state.primary = _state.wrote = False
+    _state.since = _state.fresh = None
+    return wrote
+
+
+def read_primary():
+    """Оставшиеся чтения запроса — из основной базы."""
+    _state.primary = True
+
+
+def is_pinned():
+    """Запрос должен видеть свежие записи, а не общий снимок."""
+    return bool(getattr(_state, 'pinned', False)
+                or getattr(_state, 'since', None) is not None)
+
+
+def fresh_replicas():
+    """Реплики, которые уже содержат последнюю запись пользователя."""
+    if _state.since is None:
+        return settings.DATABASE_REPLICAS
+    if _state.fresh is None:
+        synced = cache.get_many(
+            [SYNCED_KEY.format(alias) for alias in settings.DATABASE_REPLICAS])
+        _state.fresh = [
+            alias for alias in settings.DATABASE_REPLICAS
+            if synced.get(SYNCED_KEY.format(alias), 0) >= _state.since]
+    return _state.fresh
+
+
+def note_write():
+    """Отмечает запись в запросе, даже если её выполнит другой поток."""
+    if getattr(_state, 'active', False):
+        # Остаток запроса читает то, что только что записано.
+        _state.wrote = _state.pinned = True
+
+
+def replica_for_read():
+    if (not settings.DATABASE_REPLICAS
+            or not getattr(_state, 'active', False)
+            or _state.pinned or _state.primary
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+        return DEFAULT_DB_ALIAS
+    replicas = fresh_replicas()
+    return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        return replica_for_read()
+
+    def db_for_write(self, model, **hints):
+        note_write()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,186 @@
+"""Профиль SQLite для продакшена.
+
+На каждое соединение ставятся PRAGMA из settings.SQLITE_PRAGMAS: WAL
+не даёт читателям ждать писателя, busy_timeout заставляет ждать
+блокировку вместо «database is locked». Записи из представлений идут
+через write(): один поток-писатель выполняет их пачками в одной
+транзакции, поэтому всплеск записей выстраивается в очередь, а не
+падает на конкуренции за блокировку файла.
+
+Пачка сначала берёт блокировку записи и только потом выполняет задачи,
+поэтому повторить после «database is locked» можно лишь ещё не
+начатую пачку. Побочные эффекты, которые не откатываются вместе
+с транзакцией (кэш, eager-задачи), идут через after_commit() и внутри
+пачки ждут её фиксации.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import routers
+
+logger = logging.getLogger(__name__)
+
+RETRIES = 5
+RETRY_DELAY = 0.05
+_STOP = object()
+_batch = threading.local()
+
+
+def after_commit(func):
+    """Вызывает func после фиксации пачки писателя, а вне пачки — сразу."""
+    using = getattr(_batch, 'using', None)
+    if using is None:
+        func()
+    else:
+        transaction.on_commit(func, using=using)
+
+
+class Locked(Exception):
+    """Блокировку записи не удалось взять: пачку можно повторить."""
+
+    def __init__(self, error):
+        super().__init__(error)
+        self.error = error
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    if not settings.SQLITE_PRODUCTION or connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+
+
+class WriteQueue:
+    """Один поток-писатель, выполняющий задачи пачками.
+
+    Каждая задача идёт в своей точке сохранения: её ошибка возвращается
+    вызывающему и не откатывает соседей по пачке.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS, batch_size=50):
+        self.using = using
+        self.batch_size = batch_size
+        self.tasks = queue.Queue()
+        self.batches = 0
+        self.thread = threading.Thread(
+            target=self.loop, name='sqlite-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        future = Future()
+        self.tasks.put((future, func, args, kwargs))
+        return future
+
+    def stop(self):
+        self.tasks.put(_STOP)
+        self.thread.join()
+
+    def loop(self):
+        try:
+            while True:
+                task = self.tasks.get()
+                if task is _STOP:
+                    return
+                batch = [task]
+                while len(batch) < self.batch_size:
+                    try:
+                        task = self.tasks.get_nowait()
+                    except queue.Empty:
+                        break
+                    if task is _STOP:
+                        self.tasks.put(_STOP)
+                        break
+                    batch.append(task)
+                self.run_batch(batch)
+        finally:
+            connections[self.using].close()
+
+    def run_batch(self, batch):
+        for attempt in range(RETRIES):
+            try:
+                outcomes = self.execute(batch)
+                break
+            except Locked as exc:
+                # Писатель из другого процесса держит файл дольше
+                # busy_timeout; задачи ещё не начинались, повтор безопасен.
+                if attempt == RETRIES - 1:
+                    outcomes = [(False, exc.error)] * len(batch)
+                    break
+                logger.warning('Пачка записей отложена: %s', exc.error)
+                time.sleep(RETRY_DELAY * 2 ** attempt)
+            except OperationalError as exc:
+                # Задачи уже выполнялись: их файлы могли сохраниться,
+                # поэтому пачка не повторяется, ошибка уходит вызывающим.
+                logger.error('Пачка записей откатилась: %s', exc)
+                outcomes = [(False, exc)] * len(batch)
+                break
+        self.batches += 1
+        for (future, *_), (ok, value) in zip(batch, outcomes):
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def reserve(self):
+        """Берёт блокировку записи до первой задачи пачки."""
+        try:
+            with connections[self.using].cursor() as cursor:
+                cursor.execute('DELETE FROM django_migrations WHERE 0')
+        except OperationalError as exc:
+            raise Locked(exc)
+
+    def execute(self, batch):
+        outcomes = []
+        with transaction.atomic(using=self.using):
+            self.reserve()
+            _batch.using = self.using
+            try:
+                for _, func, args, kwargs in batch:
+                    try:
+                        with transaction.atomic(using=self.using):
+                            outcomes.append((True, func(*args, **kwargs)))
+                    except OperationalError:
+                        raise
+                    except Exception as exc:
+                        outcomes.append((False, exc))
+            finally:
+                _batch.using = None
+        return outcomes
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = WriteQueue(batch_size=settings.SQLITE_WRITE_BATCH)
+        return _queue
+
+
+def write(func, *args, **kwargs):
+    """Выполняет запись через очередь писателя и возвращает результат.
+
+    Без очереди, вне SQLite или внутри уже открытой транзакции функция
+    вызывается сразу: транзакцию вызывающего нельзя разорвать.
+    """
+    routers.note_write()
+    connection = connections[DEFAULT_DB_ALIAS]
+    if (not settings.SQLITE_WRITE_QUEUE or connection.vendor != 'sqlite'
+            or connection.in_atomic_block):
+        return func(*args, **kwargs)
+    return get_queue().submit(func, *args, **kwargs).result(
+        timeout=settings.SQLITE_WRITE_TIMEOUT)
@@ -0,0 +1,58 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+from django.template.base import token_kwargs
+
+from core.compute import get_or_compute
+
+# Замена встроенного {% cache %} с тем же синтаксисом:
+# {% load fragment_cache %}{% cache 20 index_page page_obj.number %}.
+# Истёкший фрагмент перерисовывает один запрос, остальные отдают прежний.
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+
+    def __init__(self, nodelist, expire_time, fragment_name, vary_on,
+                 cache_name):
+        self.nodelist = nodelist
+        self.expire_time = expire_time
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+        self.cache_name = cache_name
+
+    def render(self, context):
+        expire_time = self.expire_time.resolve(context)
+        if expire_time is not None:
+            try:
+                expire_time = int(expire_time)
+            except (ValueError, TypeError):
+                raise template.TemplateSyntaxError(
+                    f'"cache" tag got a non-integer timeout value: '
+                    f'{expire_time!r}')
+        using = 'default'
+        if self.cache_name:
+            using = self.cache_name.resolve(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = make_template_fragment_key(self.fragment_name, vary_on)
+        return get_or_compute(key, lambda: self.nodelist.render(context),
+                              expire_time, using=using)
+
+
+@register.tag('cache')
+def do_cache(parser, token):
+    nodelist = parser.parse(('endcache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{tokens[0]}' tag requires at least 2 arguments.")
+    cache_name = None
+    if len(tokens) > 3 and tokens[-1].startswith('using='):
+        cache_name = token_kwargs([tokens.pop()], parser)['using']
+    return FragmentCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+        cache_name,
+    )
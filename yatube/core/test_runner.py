@@ -0,0 +1,23 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TempMediaRunner(DiscoverRunner):
+    """Запускает тесты с MEDIA_ROOT во временном каталоге.
+
+    Загрузки, копии картинок и кэш sorl не попадают в media/ проекта.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.media_root = tempfile.mkdtemp(prefix='yatube-media-')
+        self.original_media_root = settings.MEDIA_ROOT
+        settings.MEDIA_ROOT = self.media_root
+
+    def teardown_test_environment(self, **kwargs):
+        settings.MEDIA_ROOT = self.original_media_root
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from core import metrics
+from core.cache import TieredCache
+
+
+class TieredCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        metrics.reset()
+        # Два экземпляра на одном файле ведут себя как два процесса.
+        self.first = self.worker()
+        self.second = self.worker()
+
+    def worker(self, **options):
+        return TieredCache(os.path.join(self.directory, 'cache.sqlite3'), {
+            'OPTIONS': {'POLL_INTERVAL': 0, **options}})
+
+    def test_values_are_shared_through_l2(self):
+        """Запись одного процесса видна другому, дальше читается из L1."""
+        self.first.set('key', {'value': 1})
+        self.assertEqual(self.second.get('key'), {'value': 1})
+        self.assertEqual(self.second.get('key'), {'value': 1})
+        self.assertIsNone(self.second.get('missing'))
+        self.assertEqual(
+            {tier: stats['reads']
+             for tier, stats in metrics.cache_tiers().items()},
+            {'l2': 1, 'l1': 1, 'miss': 1})
+        self.assertIn('yatube_cache_tier_reads_total{tier="l1"} 1',
+                      metrics.prometheus())
+
+    def test_writes_evict_l1_in_other_processes(self):
+        """Изменение и удаление ключа выбрасывают его из чужого L1."""
+        self.first.set('key', 'old')
+        self.assertEqual(self.second.get('key'), 'old')
+        self.first.set('key', 'new')
+        self.assertEqual(self.second.get('key'), 'new')
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+        self.second.set('other', 1)
+        self.first.clear()
+        self.assertIsNone(self.second.get('other'))
+
+    def test_add_and_incr_are_shared(self):
+        """add и incr атомарны относительно общего хранилища."""
+        self.assertTrue(self.first.add('lock', 1))
+        self.assertFalse(self.second.add('lock', 2))
+        self.first.set('counter', 1)
+        self.second.get('counter')
+        self.assertEqual(self.first.incr('counter'), 2)
+        self.assertEqual(self.second.incr('counter', 5), 7)
+        self.assertEqual(self.first.get('counter'), 7)
+        with self.assertRaises(ValueError):
+            self.first.incr('absent')
+
+    def test_l1_is_bounded_by_size(self):
+        """L1 вытесняет старые значения сверх лимита по байтам."""
+        cache = self.worker(L1_MAX_BYTES=300)
+        for index in range(5):
+            cache.set(f'key{index}', 'x' * 100)
+        self.assertLessEqual(cache.l1.size, 300)
+        self.assertIsNone(cache.l1.get(cache.make_key('key0')))
+        self.assertEqual(cache.get('key0'), 'x' * 100)
+
+    def test_expired_values_are_not_returned(self):
+        self.first.set('key', 'value', timeout=0)
+        self.assertIsNone(self.second.get('key'))
+        self.assertIsNone(self.first.get('key'))
@@ -0,0 +1,63 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import SimpleTestCase
+
+from core import compute
+from core.compute import LOCK_KEY, get_or_compute
+
+
+class GetOrComputeTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def calculate(self):
+        self.calls += 1
+        return self.calls
+
+    def test_value_is_computed_once(self):
+        """Свежее значение берётся из кэша без пересчёта."""
+        self.assertEqual(get_or_compute('key', self.calculate, 60, beta=0), 1)
+        self.assertEqual(get_or_compute('key', self.calculate, 60, beta=0), 1)
+
+    def test_stale_value_is_served_while_other_recomputes(self):
+        """Пока пересчитывает другой, отдаётся прежнее значение."""
+        get_or_compute('key', self.calculate, 60, version=1)
+        cache.add(LOCK_KEY.format('key'), 1)
+        self.assertEqual(
+            get_or_compute('key', self.calculate, 60, version=2), 1)
+        self.assertEqual(self.calls, 1)
+        cache.delete(LOCK_KEY.format('key'))
+        self.assertEqual(
+            get_or_compute('key', self.calculate, 60, version=2), 2)
+        self.assertIsNone(cache.get(LOCK_KEY.format('key')))
+
+    def test_early_recomputation(self):
+        """Чем ближе срок и дольше расчёт, тем вероятнее ранний пересчёт."""
+        self.assertFalse(compute.expires_early(0.1, 1e18))
+        self.assertTrue(compute.expires_early(1e6, 0))
+        get_or_compute('key', self.calculate, 60)
+        with mock.patch.object(compute, 'expires_early', return_value=True):
+            self.assertEqual(get_or_compute('key', self.calculate, 60), 2)
+
+    @mock.patch.object(compute, 'WAIT_TIMEOUT', 0.1)
+    def test_miss_waits_for_lock_holder_then_computes(self):
+        """Без прежнего значения ждёт чужой расчёт, затем считает сам."""
+        cache.add(LOCK_KEY.format('key'), 1)
+        self.assertEqual(get_or_compute('key', self.calculate, 60), 1)
+        self.assertIsNone(cache.get('key'))
+
+    def test_fragment_cache_tag(self):
+        """{% cache %} из fragment_cache подменяет встроенный тег."""
+        template = Template(
+            '{% load fragment_cache %}'
+            '{% cache 60 counter page %}{{ value }}{% endcache %}')
+        self.assertEqual(
+            template.render(Context({'value': 'one', 'page': 1})), 'one')
+        self.assertEqual(
+            template.render(Context({'value': 'two', 'page': 1})), 'one')
+        self.assertEqual(
+            template.render(Context({'value': 'two', 'page': 2})), 'two')
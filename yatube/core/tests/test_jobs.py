@@ -0,0 +1,131 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job
+from posts import thumbnails
+
+CALLS = []
+
+
+@jobs.task('tests.record')
+def record(value):
+    CALLS.append(value)
+
+
+@jobs.task('tests.broken', max_attempts=2)
+def broken():
+    raise ValueError('сбой')
+
+
+FAST_DONE = threading.Event()
+
+
+@jobs.task('tests.slow')
+def slow():
+    # Дождётся, только если быстрые задачи выполнялись параллельно.
+    CALLS.append(('slow', FAST_DONE.wait(5)))
+
+
+@jobs.task('tests.fast')
+def fast(value):
+    CALLS.append(value)
+    if len(CALLS) == 5:
+        FAST_DONE.set()
+
+
+@override_settings(JOBS_EAGER=False)
+class JobQueueTest(TestCase):
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_eager_mode_runs_immediately(self):
+        with self.settings(JOBS_EAGER=True):
+            self.assertIsNone(record.enqueue('сразу'))
+        self.assertEqual(CALLS, ['сразу'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_dedup_key_keeps_single_queued_job(self):
+        first = record.enqueue(1, dedup_key='same')
+        second = record.enqueue(2, dedup_key='same')
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Job.objects.count(), 1)
+        thumbnails.schedule('posts/cat.jpg')
+        thumbnails.schedule('posts/cat.jpg')
+        self.assertEqual(Job.objects.filter(
+            name=thumbnails.generate.task_name).count(), 1)
+
+    def test_successful_job_is_removed(self):
+        record.enqueue('готово')
+        claimed = jobs.claim(10)
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(jobs.claim(10), [])
+        self.assertTrue(jobs.execute(*claimed[0]))
+        self.assertEqual(CALLS, ['готово'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = broken.enqueue()
+        self.assertFalse(jobs.execute(*jobs.claim(10)[0]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('ValueError', job.last_error)
+        self.assertEqual(jobs.claim(10), [])
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.execute(*jobs.claim(10)[0])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_stale_running_job_is_released(self):
+        record.enqueue('брошена')
+        jobs.claim(10)
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.release_stale(lease=60), 1)
+        self.assertEqual(len(jobs.claim(10)), 1)
+
+    def test_released_job_is_skipped_by_old_worker(self):
+        record.enqueue('вернулась')
+        stale = jobs.claim(10)[0]
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        jobs.release_stale(lease=60)
+        self.assertIsNone(jobs.execute(*stale))
+        self.assertEqual(Job.objects.get().status, Job.QUEUED)
+        # Задачу взял другой воркер: прежний токен её не трогает.
+        fresh = jobs.claim(10)[0]
+        self.assertIsNone(jobs.execute(*stale))
+        self.assertEqual(CALLS, [])
+        self.assertTrue(jobs.execute(*fresh))
+        self.assertEqual(CALLS, ['вернулась'])
+
+
+@override_settings(JOBS_EAGER=False)
+class RunJobsCommandTest(TransactionTestCase):
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_worker_drains_queue_in_thread_pool(self):
+        for number in range(5):
+            record.enqueue(number)
+        out = StringIO()
+        call_command('run_jobs', '--once', '--workers', '3', stdout=out)
+        self.assertEqual(sorted(CALLS), list(range(5)))
+        self.assertIn('Выполнено: 5', out.getvalue())
+        self.assertFalse(Job.objects.exists())
+
+    def test_slow_job_does_not_hold_other_workers(self):
+        FAST_DONE.clear()
+        slow.enqueue()
+        for number in range(5):
+            fast.enqueue(number)
+        call_command('run_jobs', '--once', '--workers', '2',
+                     stdout=StringIO())
+        self.assertIn(('slow', True), CALLS)
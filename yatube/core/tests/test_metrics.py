@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+
+from core import metrics
+
+User = get_user_model()
+
+
+class PerformanceMetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        metrics.reset()
+        # Иначе главная может прийти из кэша страниц без рендеринга.
+        cache.clear()
+        self.client = Client()
+
+    def test_requests_are_measured_per_url_name(self):
+        """Время, SQL, шаблоны и кэш копятся по имени URL."""
+        self.client.get('/')
+        self.client.get('/')
+        index = metrics.snapshot()['yatube_posts:index']
+        self.assertEqual(index['requests'], 2)
+        self.assertGreater(index['sql_queries'], 0)
+        self.assertGreater(index['template_ms'], 0)
+
+    def test_metrics_endpoint_is_protected(self):
+        """Метрики видны staff и по токену, остальным — 403."""
+        self.client.get('/')
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        self.client.force_login(self.staff)
+        response = self.client.get('/metrics/')
+        self.assertContains(
+            response,
+            'yatube_request_duration_ms_count{view="yatube_posts:index"} 1')
+        with override_settings(METRICS_TOKEN='secret'):
+            response = Client().get(
+                '/metrics/?format=json', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertIn('yatube_posts:index', response.json())
+
+    @override_settings(PERFORMANCE_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_with_fingerprints(self):
+        """Медленный запрос пишется в лог с отпечатками SQL."""
+        with self.assertLogs('yatube.performance', 'WARNING') as logs:
+            self.client.get('/profile/auth/')
+        self.assertIn('"auth_user"."username" = ?', logs.output[0])
+
+    def test_fingerprint_hides_literals(self):
+        self.assertEqual(
+            metrics.fingerprint("SELECT 1 FROM t WHERE a = 'x' AND b IN "
+                                "(1, 2, 3)"),
+            'SELECT ? FROM t WHERE a = ? AND b IN (...)')
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import tempfile
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase,
+                         TransactionTestCase, override_settings)
+
+from core import routers
+from core.middleware import ReplicaPinMiddleware
+from posts.models import Post
+
+User = get_user_model()
+router = routers.ReplicaRouter()
+
+
+@override_settings(DATABASE_REPLICAS=['replica0'])
+class ReplicaRouterTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.reads = []
+
+    def view(self, write=False):
+        def view(request):
+            self.reads.append(router.db_for_read(Post))
+            if write:
+                router.db_for_write(Post)
+                self.reads.append(router.db_for_read(Post))
+            return HttpResponse()
+        return ReplicaPinMiddleware(view)
+
+    def pinned_request(self, written):
+        request = self.factory.get('/')
+        request.COOKIES[settings.REPLICA_PIN_COOKIE] = repr(written)
+        return request
+
+    def test_reads_go_to_replica_only_inside_requests(self):
+        self.assertEqual(router.db_for_read(Post), 'default')
+        self.view()(self.factory.get('/'))
+        self.assertEqual(self.reads, ['replica0'])
+        self.assertEqual(router.db_for_write(Post), 'default')
+
+    def test_users_and_sessions_stay_on_primary(self):
+        routers.start_request()
+        try:
+            self.assertEqual(router.db_for_read(User), 'default')
+            self.assertEqual(router.db_for_read(Session), 'default')
+        finally:
+            routers.finish_request()
+
+    def test_write_on_read_pins_only_rest_of_request(self):
+        response = self.view(write=True)(self.factory.get('/'))
+        self.assertEqual(self.reads, ['replica0', 'default'])
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_write_pins_reads_until_replica_catches_up(self):
+        response = self.view(write=True)(self.factory.post('/'))
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+        written = float(cookie.value)
+        routers.mark_synced('replica0', written - 1)
+        self.view()(self.pinned_request(written))
+        self.assertEqual(self.reads[-1], 'default')
+        routers.mark_synced('replica0', written + 1)
+        self.view()(self.pinned_request(written))
+        self.assertEqual(self.reads[-1], 'replica0')
+
+    def test_unsafe_methods_read_primary(self):
+        response = self.view()(self.factory.post('/'))
+        self.assertEqual(self.reads, ['default'])
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_pinned_state(self):
+        routers.start_request(since=time.time())
+        self.assertTrue(routers.is_pinned())
+        routers.finish_request()
+        routers.start_request()
+        routers.read_primary()
+        self.assertFalse(routers.is_pinned())
+        self.assertEqual(router.db_for_read(Post), 'default')
+        routers.finish_request()
+
+
+class SyncReplicasTest(TransactionTestCase):
+
+    def test_copies_primary_into_replica_file(self):
+        User.objects.create_user(username='replicated')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'replica.sqlite3')
+            call_command('sync_replicas', path, stdout=StringIO())
+            replica = sqlite3.connect(path)
+            try:
+                rows = replica.execute(
+                    'SELECT username FROM auth_user').fetchall()
+            finally:
+                replica.close()
+        self.assertIn(('replicated',), rows)
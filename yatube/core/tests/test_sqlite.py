@@ -0,0 +1,135 @@
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import (SimpleTestCase, TransactionTestCase,
+                         override_settings)
+
+from core import sqlite
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(SQLITE_PRODUCTION=True)
+class PragmasTest(SimpleTestCase):
+
+    def test_pragmas_applied_on_connect(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = DatabaseWrapper({
+                **connection.settings_dict,
+                'NAME': os.path.join(directory, 'prod.sqlite3'),
+            }, alias='pragmas')
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute('PRAGMA busy_timeout')
+                    self.assertEqual(cursor.fetchone()[0], 5000)
+                    cursor.execute('PRAGMA synchronous')
+                    # 1 — NORMAL.
+                    self.assertEqual(cursor.fetchone()[0], 1)
+            finally:
+                wrapper.close()
+
+
+@override_settings(SQLITE_WRITE_QUEUE=True)
+class WriteQueueStressTest(TransactionTestCase):
+    THREADS = 8
+    WRITES = 25
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='writer')
+        self.post = Post.objects.create(author=self.author, text='Запись')
+        self.queue = sqlite.WriteQueue(batch_size=20)
+        patcher = mock.patch.object(sqlite, '_queue', self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.queue.stop)
+
+    def test_concurrent_writes_are_serialized(self):
+        """Всплеск записей из многих потоков проходит без ошибок."""
+        errors = []
+        start = threading.Barrier(self.THREADS)
+
+        def worker(number):
+            start.wait()
+            for index in range(self.WRITES):
+                comment = Comment(post=self.post, author=self.author,
+                                  text=f'Поток {number}, №{index}')
+                try:
+                    sqlite.write(comment.save)
+                except Exception as exc:
+                    errors.append(exc)
+
+        threads = [threading.Thread(target=worker, args=(number,))
+                   for number in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(Comment.objects.count(),
+                         self.THREADS * self.WRITES)
+        self.assertLess(self.queue.batches, self.THREADS * self.WRITES)
+
+    def test_failed_task_does_not_roll_back_batch(self):
+        def broken():
+            User.objects.create_user(username='lost')
+            raise ValueError('сбой')
+
+        failed = self.queue.submit(broken)
+        saved = self.queue.submit(User.objects.create_user, username='kept')
+        with self.assertRaises(ValueError):
+            failed.result(timeout=10)
+        self.assertEqual(saved.result(timeout=10).username, 'kept')
+        self.assertFalse(User.objects.filter(username='lost').exists())
+
+    def test_side_effects_wait_for_batch_commit(self):
+        calls = []
+
+        def task(fail):
+            sqlite.after_commit(lambda: calls.append(f'после {fail}'))
+            calls.append(f'задача {fail}')
+            if fail:
+                raise ValueError('сбой')
+
+        failed = self.queue.submit(task, True)
+        saved = self.queue.submit(task, False)
+        with self.assertRaises(ValueError):
+            failed.result(timeout=10)
+        saved.result(timeout=10)
+        self.assertEqual(calls, ['задача True', 'задача False',
+                                 'после False'])
+
+    def test_locked_batch_is_retried_before_tasks_run(self):
+        calls = []
+        reserve = self.queue.reserve
+        attempts = iter([OperationalError('database is locked')])
+
+        def flaky_reserve():
+            error = next(attempts, None)
+            if error is not None:
+                raise sqlite.Locked(error)
+            reserve()
+
+        with mock.patch.object(self.queue, 'reserve', flaky_reserve), \
+                self.assertLogs('core.sqlite', 'WARNING'):
+            self.queue.submit(calls.append, 'запись').result(timeout=10)
+        self.assertEqual(calls, ['запись'])
+
+    def test_started_batch_is_not_retried(self):
+        calls = []
+
+        def task():
+            calls.append('запуск')
+            raise OperationalError('disk I/O error')
+
+        with self.assertLogs('core.sqlite', 'ERROR'):
+            with self.assertRaises(OperationalError):
+                self.queue.submit(task).result(timeout=10)
+        self.assertEqual(calls, ['запуск'])
@@ -1,4 +1,10 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from . import holes, metrics
 
 
 def page_not_found(request, exception):
@@ -11,3 +17,28 @@ def forbidden_error(request, exception):
 
 def internal_server_error(request, exception=None):
     return render(request, 'core/500.html', {'path': request.path}, status=500)
+
+
+def personal_view(request):
+    """Персональные фрагменты страницы: ?hole=follow_button:leo&hole=..."""
+    fragments = {}
+    for value in request.GET.getlist('hole'):
+        name, args = holes.parse(value)
+        fragments[value] = holes.render(name, request, args)
+    response = JsonResponse(fragments)
+    response['Cache-Control'] = 'private, no-store'
+    return response
+
+
+def metrics_view(request):
+    """Метрики производительности; доступ для staff или по токену."""
+    token = request.META.get('HTTP_AUTHORIZATION', '')
+    allowed = request.user.is_staff or (
+        settings.METRICS_TOKEN
+        and constant_time_compare(token, f'Bearer {settings.METRICS_TOKEN}'))
+    if not allowed:
+        raise PermissionDenied
+    if request.GET.get('format') == 'json':
+        return JsonResponse(metrics.snapshot())
+    return HttpResponse(metrics.prometheus(),
+                        content_type='text/plain; version=0.0.4')
@@ -0,0 +1,215 @@
+"""Нагрузочный стенд для представлений posts.
+
+seed() наполняет базу синтетическими данными пачками bulk_create,
+measure() прогоняет страницы тестовым клиентом и собирает перцентили
+времени ответа, число SQL-запросов и пик выделенной памяти.
+Результат — словарь, который сохраняется в JSON и сравнивается
+между коммитами через compare().
+"""
+import random
+import subprocess
+import time
+import tracemalloc
+from itertools import accumulate
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Comment, Follow, Group, Post, User
+
+USERNAME = 'bench_user_{}'
+VIEWS = ('index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+         'add_comment')
+
+
+def _batches(objects, batch_size):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _bulk(model, objects, batch_size):
+    for batch in _batches(objects, batch_size):
+        model.objects.bulk_create(batch, batch_size=batch_size)
+
+
+def seed(users, posts, follows, comments, groups=20, batch_size=1000,
+         random_seed=0, stdout=None):
+    """Создаёт пользователей, группы, записи, подписки и комментарии.
+
+    Популярность авторов распределена по закону Ципфа: на немногих
+    авторов подписано большинство, они же пишут больше всего записей.
+    """
+    rnd = random.Random(random_seed)
+
+    def log(message):
+        if stdout is not None:
+            stdout.write(message)
+
+    first_user = User.objects.count()
+    _bulk(User, (User(username=USERNAME.format(first_user + i),
+                      password='!') for i in range(users)), batch_size)
+    user_ids = list(User.objects.filter(
+        username__startswith='bench_user_').values_list('id', flat=True))
+    log(f'Пользователей: {len(user_ids)}')
+    first_group = Group.objects.count()
+    _bulk(Group, (Group(title=f'Группа {first_group + i}',
+                        slug=f'bench-group-{first_group + i}',
+                        description='Сгенерировано для бенчмарка')
+                  for i in range(groups)), batch_size)
+    group_ids = list(Group.objects.filter(
+        slug__startswith='bench-group-').values_list('id', flat=True))
+    # Накопленные веса считаются один раз: choices(weights=...) пересчитывал
+    # бы их на каждый вызов, то есть на каждого пользователя.
+    cum_weights = list(accumulate(
+        1 / (rank + 1) for rank in range(len(user_ids))))
+
+    def authors(count):
+        return rnd.choices(user_ids, cum_weights=cum_weights, k=count)
+
+    _bulk(Post, (
+        Post(author_id=author_id, group_id=rnd.choice(group_ids + [None]),
+             text=f'Синтетическая запись номер {i}')
+        for i, author_id in enumerate(authors(posts))
+    ), batch_size)
+    log(f'Записей: {posts}')
+
+    def follow_pairs():
+        for user_id in user_ids:
+            for author_id in set(authors(follows)) - {user_id}:
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    _bulk(Follow, follow_pairs(), batch_size)
+    log(f'Подписок: до {follows * len(user_ids)}')
+    last_post = Post.objects.order_by('-id').values_list(
+        'id', flat=True).first() or 0
+    first_post = max(last_post - posts + 1, 1)
+    _bulk(Comment, (
+        Comment(author_id=rnd.choice(user_ids),
+                post_id=rnd.randint(first_post, last_post),
+                text=f'Синтетический комментарий {i}')
+        for i in range(comments)
+    ), batch_size)
+    log(f'Комментариев: {comments}')
+    # bulk_create не шлёт сигналов, счётчики авторов чиним отдельно.
+    call_command('reconcile_author_stats', stdout=stdout)
+
+
+def _targets():
+    post = Post.objects.order_by('-id').select_related(
+        'author', 'group').first()
+    group = Group.objects.filter(group_posts__isnull=False).first()
+    reader = (User.objects.filter(follower__isnull=False)
+              .order_by('id').first())
+    if post is None or group is None or reader is None:
+        raise ValueError('В базе нет данных: запустите бенчмарк с --seed')
+    return reader, {
+        'index': ('get', reverse('yatube_posts:index')),
+        'group_posts': ('get', reverse('yatube_posts:group_posts',
+                                       kwargs={'slug': group.slug})),
+        'profile': ('get', reverse('yatube_posts:profile',
+                                   kwargs={'username': post.author})),
+        'post_detail': ('get', reverse('yatube_posts:post_detail',
+                                       kwargs={'post_id': post.pk})),
+        'follow_index': ('get', reverse('yatube_posts:follow_index')),
+        'add_comment': ('post', reverse('yatube_posts:add_comment',
+                                        kwargs={'post_id': post.pk})),
+    }
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_kb(call, cold=False):
+    """Пик памяти одного запроса в КБ, под tracemalloc."""
+    if cold:
+        cache.clear()
+    tracemalloc.start()
+    try:
+        call()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def measure(requests=50, warmup=5, cold=False, views=VIEWS,
+            memory_requests=10):
+    """Прогоняет страницы и возвращает метрики по каждой из них.
+
+    Время замеряется без tracemalloc, который замедляет каждое
+    выделение памяти; пик памяти снимается отдельным проходом.
+    """
+    reader, targets = _targets()
+    client = Client()
+    client.force_login(reader)
+    results = {}
+    for name in views:
+        method, url = targets[name]
+        data = {'text': 'Комментарий из бенчмарка'}
+
+        def call():
+            if method == 'post':
+                return client.post(url, data)
+            return client.get(url)
+
+        for _ in range(warmup):
+            call()
+        timings, queries = [], []
+        for _ in range(requests):
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = call()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+            if response.status_code >= 400:
+                raise ValueError(f'{url}: ответ {response.status_code}')
+        peaks = [peak_kb(call, cold)
+                 for _ in range(min(requests, memory_requests))]
+        results[name] = {
+            'url': url,
+            'p50_ms': round(percentile(timings, 0.5), 3),
+            'p90_ms': round(percentile(timings, 0.9), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'queries': max(queries),
+            'peak_kb': round(max(peaks), 1),
+        }
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline):
+    """Строки «страница: метрика было -> стало (изменение %)»."""
+    lines = []
+    for name, metrics in current['views'].items():
+        old = baseline.get('views', {}).get(name)
+        if old is None:
+            continue
+        for metric in ('p50_ms', 'p99_ms', 'queries', 'peak_kb'):
+            before, after = old[metric], metrics[metric]
+            change = (after - before) / before * 100 if before else 0
+            lines.append(f'{name}: {metric} {before} -> {after} '
+                         f'({change:+.1f}%)')
+    return lines
@@ -0,0 +1,319 @@
+"""Потоковый импорт и экспорт записей, комментариев и подписок.
+
+Данные читаются и пишутся построчно (JSON Lines или CSV) пачками
+фиксированного размера, поэтому память не зависит от объёма выгрузки.
+Авторы и группы ищутся через ограниченный LRU-кэш. После каждой пачки
+сохраняется контрольная точка, и прерванный перенос можно продолжить.
+bulk_create не шлёт сигналов, поэтому после пачки импорт сам
+увеличивает версии затронутых лент, записей и подписок и пересчитывает
+счётчики затронутых авторов и записей.
+"""
+import csv
+import json
+import os
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from . import stats, timeline, versions
+from .models import Comment, Follow, Group, Post, User
+
+KINDS = {
+    'posts': (Post, ('id', 'author', 'group', 'text', 'pub_date', 'image')),
+    'comments': (Comment, ('id', 'post', 'author', 'text', 'pub_date')),
+    'follows': (Follow, ('id', 'user', 'author')),
+}
+# Строки без id узнаются по этим полям, если пачку вставляют повторно.
+NATURAL_KEYS = {
+    'posts': ('author_id', 'pub_date', 'text'),
+    'comments': ('post_id', 'author_id', 'pub_date', 'text'),
+}
+EXPORT_VALUES = {
+    'author': 'author__username',
+    'user': 'user__username',
+    'group': 'group__slug',
+    'post': 'post_id',
+}
+
+
+class LookupCache:
+    """Ограниченный LRU-кэш «ключ -> id» с подгрузкой пачкой."""
+
+    def __init__(self, model, field, size=10_000):
+        self.model = model
+        self.field = field
+        self.size = size
+        self.items = OrderedDict()
+
+    def load(self, keys):
+        missing = {key for key in keys if key and key not in self.items}
+        if missing:
+            rows = self.model.objects.filter(
+                **{f'{self.field}__in': missing}).values_list(
+                self.field, 'id')
+            for key, pk in rows:
+                self.remember(key, pk)
+
+    def remember(self, key, pk):
+        self.items[key] = pk
+        self.items.move_to_end(key)
+        while len(self.items) > self.size:
+            self.items.popitem(last=False)
+
+    def get(self, key):
+        pk = self.items.get(key)
+        if pk is not None:
+            self.items.move_to_end(key)
+        return pk
+
+
+class Checkpoint:
+    """Позиция переноса в файле рядом с данными, пишется атомарно.
+
+    Выгрузка сохраняет вместе с позицией смещение в байтах, до которого
+    файл записан; строки после него при продолжении отбрасываются.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _parts(self):
+        if not self.path or not os.path.exists(self.path):
+            return []
+        with open(self.path, encoding='utf-8') as file:
+            return file.read().split()
+
+    def read(self):
+        parts = self._parts()
+        return int(parts[0]) if parts else 0
+
+    def offset(self):
+        """Смещение в файле выгрузки или None, если его не сохраняли."""
+        parts = self._parts()
+        return int(parts[1]) if len(parts) > 1 else None
+
+    def write(self, position, offset=None):
+        if not self.path:
+            return
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            file.write(str(position) if offset is None
+                       else f'{position} {offset}')
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+@contextmanager
+def original_pub_date(model):
+    """Даёт bulk_create сохранить pub_date из выгрузки, а не текущее время.
+
+    auto_now_add подставляет время вставки даже в bulk_create, поэтому
+    на время импорта оно отключается.
+    """
+    field = model._meta.get_field('pub_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def export_rows(kind, after_id=0, chunk_size=2000):
+    """Строки выгрузки по возрастанию id, читаются keyset-пачками."""
+    model, fields = KINDS[kind]
+    values = [EXPORT_VALUES.get(field, field) for field in fields]
+    last_id = after_id
+    while True:
+        chunk = list(model.objects.filter(pk__gt=last_id).order_by('pk')
+                     .values_list(*values)[:chunk_size])
+        if not chunk:
+            return
+        for row in chunk:
+            record = dict(zip(fields, row))
+            if 'pub_date' in record:
+                record['pub_date'] = record['pub_date'].isoformat()
+            yield record
+        last_id = chunk[-1][0]
+
+
+def write_records(records, file, file_format, fields, header=True):
+    if file_format == 'csv':
+        writer = csv.DictWriter(file, fieldnames=fields)
+        if header:
+            writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            yield record['id']
+    else:
+        for record in records:
+            file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            yield record['id']
+
+
+def read_records(file, file_format):
+    if file_format == 'csv':
+        yield from csv.DictReader(file)
+    else:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _batches(records, size, skip):
+    batch = []
+    for number, record in enumerate(records, start=1):
+        if number <= skip:
+            continue
+        batch.append(record)
+        if len(batch) == size:
+            yield number, batch
+            batch = []
+    if batch:
+        yield number, batch
+
+
+class Importer:
+    """Превращает пачку словарей в объекты модели и вставляет их."""
+
+    def __init__(self, kind, create_users=False):
+        self.kind = kind
+        self.model, self.fields = KINDS[kind]
+        self.create_users = create_users
+        self.users = LookupCache(User, 'username')
+        self.groups = LookupCache(Group, 'slug')
+        self.skipped = 0
+        self.invalid = 0
+
+    def resolve_users(self, usernames):
+        self.users.load(usernames)
+        missing = {name for name in usernames
+                   if name and self.users.get(name) is None}
+        if missing and self.create_users:
+            User.objects.bulk_create(
+                [User(username=name, password='!') for name in missing],
+                ignore_conflicts=True)
+            self.users.load(missing)
+
+    def build(self, record):
+        try:
+            return self._build(record)
+        except (KeyError, TypeError, ValueError):
+            # Битая строка выгрузки: пропускаем, а не роняем пачку.
+            self.invalid += 1
+            return None
+
+    def _build(self, record):
+        data = {'id': int(record['id'])} if record.get('id') else {}
+        for field in ('author', 'user'):
+            if field in self.fields:
+                data[f'{field}_id'] = self.users.get(record.get(field))
+                if data[f'{field}_id'] is None:
+                    return None
+        if 'group' in self.fields:
+            data['group_id'] = self.groups.get(record.get('group') or None)
+        if 'post' in self.fields:
+            data['post_id'] = int(record['post'])
+        for field in ('text', 'image'):
+            if field in self.fields:
+                data[field] = record.get(field) or ''
+        if 'pub_date' in self.fields:
+            data['pub_date'] = parse_datetime(record['pub_date'])
+            if data['pub_date'] is None:
+                raise ValueError('pub_date')
+        return self.model(**data)
+
+    def drop_existing(self, objects):
+        """Убирает строки без id, которые уже есть в базе."""
+        keys = NATURAL_KEYS.get(self.kind)
+        new = [obj for obj in objects if obj.pk is None]
+        if not keys or not new:
+            return objects
+        existing = set(self.model.objects.filter(
+            author_id__in={obj.author_id for obj in new},
+            pub_date__in={obj.pub_date for obj in new},
+        ).values_list(*keys))
+        kept = [obj for obj in objects if obj.pk is not None or tuple(
+            getattr(obj, key) for key in keys) not in existing]
+        self.skipped += len(objects) - len(kept)
+        return kept
+
+    def insert(self, batch, replay=False):
+        """replay — пачку могли вставить до сбоя, не записав точку."""
+        usernames = {record.get(field) for record in batch
+                     for field in ('author', 'user') if field in self.fields}
+        self.resolve_users(usernames)
+        if 'group' in self.fields:
+            self.groups.load({record.get('group') for record in batch})
+        objects = []
+        for record in batch:
+            obj = self.build(record)
+            if obj is None:
+                self.skipped += 1
+            else:
+                objects.append(obj)
+        if 'post' in self.fields:
+            known = set(Post.objects.filter(
+                pk__in={obj.post_id for obj in objects}).values_list(
+                'id', flat=True))
+            self.skipped += sum(obj.post_id not in known for obj in objects)
+            objects = [obj for obj in objects if obj.post_id in known]
+        if replay:
+            objects = self.drop_existing(objects)
+        # ignore_conflicts делает повтор пачки после сбоя безопасным.
+        self.model.objects.bulk_create(objects, ignore_conflicts=True)
+        return objects
+
+    def invalidate(self, objects):
+        """Сбрасывает кэш, который сигналы сбросили бы при save()."""
+        if self.model is Post:
+            for author_id, group_id in {(obj.author_id, obj.group_id)
+                                        for obj in objects}:
+                versions.bump_feeds(author_id, group_id)
+                timeline.invalidate_followers(author_id)
+        elif self.model is Comment:
+            for post_id in {obj.post_id for obj in objects}:
+                versions.bump('comments', post_id)
+        else:
+            for user_id in {obj.user_id for obj in objects}:
+                versions.bump('follows', user_id)
+                timeline.invalidate(user_id)
+
+    def reconcile(self, objects):
+        """Пересчитывает счётчики, которые сигналы поменяли бы при save()."""
+        user_ids = {getattr(obj, f'{field}_id') for obj in objects
+                    for field in ('author', 'user') if field in self.fields}
+        stats.reconcile_authors(user_ids)
+        if self.model is Comment:
+            stats.reconcile_comment_counts(
+                post_ids={obj.post_id for obj in objects})
+
+
+def import_records(records, kind, checkpoint, batch_size=1000,
+                   create_users=False):
+    """Импортирует записи пачками, продолжая с контрольной точки.
+
+    Точка пишется после фиксации пачки, поэтому первая пачка прогона
+    могла попасть в базу до сбоя: строки с id повтор отбрасывает
+    ignore_conflicts, а строки без id сверяются по NATURAL_KEYS.
+    Возвращает (вставлено, пропущено, битых строк).
+    """
+    importer = Importer(kind, create_users)
+    inserted = 0
+    start = checkpoint.read()
+    replay = True
+    with original_pub_date(importer.model) if (
+            'pub_date' in importer.fields) else nullcontext():
+        for position, batch in _batches(records, batch_size, start):
+            with transaction.atomic():
+                objects = importer.insert(batch, replay)
+            replay = False
+            importer.invalidate(objects)
+            importer.reconcile(objects)
+            inserted += len(objects)
+            checkpoint.write(position)
+    return inserted, importer.skipped, importer.invalid
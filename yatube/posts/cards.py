@@ -0,0 +1,40 @@
+"""Кэш отрисованных карточек записей для лент.
+
+Ключ карточки состоит из id записи и версий самой записи, её автора и
+группы, так что любое их изменение делает карточку недействительной.
+Страница ленты собирает все свои карточки одним get_many.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from . import versions
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+CARD_KEY = 'post_card:{}:{}.{}.{}'
+
+
+def card_versions(post):
+    return [('post', post.pk), ('user', post.author_id),
+            ('group', post.group_id)]
+
+
+def render_cards(posts):
+    """Возвращает HTML карточек в порядке posts."""
+    posts = list(posts)
+    pairs = {pair for post in posts for pair in card_versions(post)}
+    known = versions.get_versions(pairs)
+    keys = [
+        CARD_KEY.format(post.pk,
+                        *(known[pair] for pair in card_versions(post)))
+        for post in posts
+    ]
+    cards = cache.get_many(keys)
+    rendered = {
+        key: render_to_string(CARD_TEMPLATE, {'post': post})
+        for key, post in zip(keys, posts) if key not in cards
+    }
+    if rendered:
+        cache.set_many(rendered, settings.POSTS_CARD_CACHE_TIMEOUT)
+        cards.update(rendered)
+    return [cards[key] for key in keys]
@@ -0,0 +1,78 @@
+"""Стратегии подсчёта записей для паджинатора лент.
+
+Небольшие ленты считаются точно, но с LIMIT: COUNT(*) не пойдёт дальше
+порога. Большие берут значение из кэша, а при промахе — оценку из
+поддерживаемых счётчиков или статистики sqlite_stat1; если оценить
+нельзя, точный COUNT(*) выполняется один раз и кэшируется. Кэш
+сбрасывается версией области при сохранении и удалении записей; пока
+один запрос пересчитывает, остальные отдают прежнее число.
+"""
+from core.compute import get_or_compute
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Sum
+
+from . import versions
+from .models import AuthorStats, Post
+
+COUNT_KEY = 'feed_count:{}'
+
+
+def sqlite_table_rows(model):
+    """Число строк таблицы из sqlite_stat1 (есть после ANALYZE)."""
+    if connection.vendor != 'sqlite':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s',
+                           [model._meta.db_table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    return int(row[0].split()[0]) if row else None
+
+
+def total_posts():
+    """Число всех записей для весов поиска: оценка или кэшированный COUNT.
+
+    Точность здесь не нужна, поэтому сначала берётся sqlite_stat1.
+    """
+    def count():
+        approximate = sqlite_table_rows(Post)
+        if approximate is not None:
+            return approximate
+        return Post.objects.count()
+
+    return get_or_compute(
+        COUNT_KEY.format('total'), count, settings.POSTS_COUNT_CACHE_TIMEOUT,
+        version=versions.get_version('feed', 'index'))
+
+
+def estimate(scope):
+    """Быстрая оценка размера ленты или None, если оценки нет."""
+    if scope == 'index':
+        return sqlite_table_rows(Post)
+    if scope.startswith('follow:'):
+        user_id = int(scope.split(':')[1])
+        return AuthorStats.objects.filter(
+            author__following__user_id=user_id).aggregate(
+            total=Sum('posts_count'))['total']
+    return None
+
+
+def feed_count(queryset, scope):
+    """Возвращает (количество, это_оценка) для ленты scope."""
+    threshold = settings.POSTS_EXACT_COUNT_THRESHOLD
+    bounded = queryset.order_by()[:threshold + 1].count()
+    if bounded <= threshold:
+        return bounded, False
+
+    def count():
+        approximate = estimate(scope)
+        if approximate is not None and approximate > threshold:
+            return approximate, True
+        return queryset.count(), False
+
+    return get_or_compute(
+        COUNT_KEY.format(scope), count, settings.POSTS_COUNT_CACHE_TIMEOUT,
+        version=versions.get_version('feed', scope))
@@ -0,0 +1,99 @@
+"""Шина событий о новых записях и комментариях.
+
+Сохранения Post и Comment после коммита публикуют событие в шину
+процесса, подписчики (соединения SSE в yatube.sse) получают его сразу.
+Процессы WSGI и SSE разные, поэтому сервер SSE ещё и опрашивает базу
+дельтой since(): записи и комментарии с id больше последних виденных.
+Запрос идёт по первичному ключу и стоит одинаково при любом объёме,
+им же догоняются переподключившиеся клиенты (Last-Event-ID).
+"""
+import threading
+from collections import namedtuple
+
+from .models import Comment, Follow, Post
+
+Event = namedtuple('Event', 'kind id channels data')
+Cursor = namedtuple('Cursor', 'post comment')
+
+DELTA_LIMIT = 500
+
+
+def post_event(post_id, author_id, group_id):
+    channels = {'index', f'author:{author_id}'}
+    if group_id is not None:
+        channels.add(f'group:{group_id}')
+    return Event('post', post_id, frozenset(channels),
+                 {'id': post_id, 'author': author_id, 'group': group_id})
+
+
+def comment_event(comment_id, post_id):
+    return Event('comment', comment_id, frozenset({f'post:{post_id}'}),
+                 {'id': comment_id, 'post': post_id})
+
+
+class EventBus:
+    """Раздаёт события подписчикам и помнит последние id по видам."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.cursor = Cursor(0, 0)
+
+    def subscribe(self, callback):
+        with self.lock:
+            self.subscribers.add(callback)
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            self.subscribers.discard(callback)
+
+    def publish(self, event):
+        """Рассылает событие, если оно новее уже разосланных."""
+        with self.lock:
+            if event.id <= getattr(self.cursor, event.kind):
+                return False
+            self.cursor = self.cursor._replace(**{event.kind: event.id})
+            subscribers = list(self.subscribers)
+        for callback in subscribers:
+            callback(event)
+        return True
+
+
+bus = EventBus()
+
+
+def encode_cursor(cursor):
+    return f'{cursor.post}-{cursor.comment}'
+
+
+def decode_cursor(value):
+    """Курсор из Last-Event-ID или None, если значение битое."""
+    try:
+        post_id, comment_id = (int(part) for part in value.split('-'))
+    except (AttributeError, ValueError):
+        return None
+    return Cursor(post_id, comment_id)
+
+
+def latest_cursor():
+    """Последние id записей и комментариев на текущий момент."""
+    return Cursor(
+        Post.objects.order_by('-id').values_list('id', flat=True).first()
+        or 0,
+        Comment.objects.order_by('-id').values_list('id', flat=True).first()
+        or 0)
+
+
+def since(cursor, limit=DELTA_LIMIT):
+    """События после курсора, от старых к новым."""
+    posts = (Post.objects.filter(id__gt=cursor.post).order_by('id')
+             .values_list('id', 'author_id', 'group_id')[:limit])
+    comments = (Comment.objects.filter(id__gt=cursor.comment).order_by('id')
+                .values_list('id', 'post_id')[:limit])
+    return ([post_event(*row) for row in posts]
+            + [comment_event(*row) for row in comments])
+
+
+def followed_channels(user_id):
+    return {f'author:{author_id}' for author_id in Follow.objects.filter(
+        user_id=user_id).values_list('author_id', flat=True)}
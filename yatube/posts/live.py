@@ -0,0 +1,231 @@
+"""Сервер Server-Sent Events на asyncio для живых обновлений.
+
+Запускается отдельно от WSGI (yatube/sse.py). Соединение — это корутина
+с небольшой очередью, поэтому тысячи простаивающих клиентов не держат
+ни потоков, ни воркеров WSGI. Один общий опрос базы раз в
+SSE_POLL_INTERVAL секунд забирает дельту events.since() и публикует её
+в шину, а шина раскладывает события по очередям подписанных клиентов.
+
+Каналы клиента передаются в ?channels=index,group:3,post:7,follow;
+follow раскрывается в авторов, на которых подписан вошедший пользователь.
+"""
+import asyncio
+import json
+import logging
+import re
+from http.cookies import CookieError, SimpleCookie
+from urllib.parse import parse_qs, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import close_old_connections
+
+from . import events
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_RE = re.compile(r'^(index|follow|(group|post|author):\d+)$')
+MAX_CHANNELS = 20
+QUEUE_SIZE = 100
+HEADER_TIMEOUT = 10
+RETRY_MS = 3000
+
+
+def in_thread(func, *args):
+    """Запрос к базе в пуле потоков, соединение закрывается сразу."""
+    def call():
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return asyncio.to_thread(call)
+
+
+def session_user_id(cookie_header):
+    try:
+        cookies = SimpleCookie(cookie_header)
+    except CookieError:
+        return None
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return None
+    return SessionStore(morsel.value).get(SESSION_KEY)
+
+
+def resolve_channels(value, cookie_header):
+    """Проверенные каналы клиента; follow превращается в авторов."""
+    requested = {channel for channel in value.split(',')
+                 if CHANNEL_RE.match(channel)}
+    channels = set(list(requested)[:MAX_CHANNELS])
+    if 'follow' in channels:
+        channels.discard('follow')
+        user_id = session_user_id(cookie_header)
+        if user_id is not None:
+            channels |= events.followed_channels(user_id)
+    return frozenset(channels)
+
+
+class Client:
+    """Очередь событий одного соединения."""
+
+    def __init__(self, channels, loop):
+        self.channels = channels
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.sent = events.Cursor(0, 0)
+
+    def offer(self, event):
+        # Шина может позвать из любого потока: очередь трогаем из цикла.
+        if event.channels & self.channels:
+            self.loop.call_soon_threadsafe(self.put, event)
+
+    def put(self, event):
+        if self.queue is None:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Медленный клиент отключается и догонит с Last-Event-ID.
+            self.queue = None
+
+    def format(self, event):
+        """Кадр SSE или None, если событие уже отправлено."""
+        if event.id <= getattr(self.sent, event.kind):
+            return None
+        self.sent = self.sent._replace(**{event.kind: event.id})
+        return (f'id: {events.encode_cursor(self.sent)}\n'
+                f'event: {event.kind}\n'
+                f'data: {json.dumps(event.data)}\n\n').encode()
+
+
+class LiveServer:
+
+    def __init__(self, poll_interval=None, keepalive=None):
+        self.poll_interval = (settings.SSE_POLL_INTERVAL
+                              if poll_interval is None else poll_interval)
+        self.keepalive = (settings.SSE_KEEPALIVE
+                          if keepalive is None else keepalive)
+        self.clients = 0
+        self.poller = None
+
+    async def start(self, host, port):
+        # История до запуска не рассылается, её отдаёт только since().
+        events.bus.cursor = await in_thread(events.latest_cursor)
+        server = await asyncio.start_server(self.handle, host, port)
+        self.poller = asyncio.create_task(self.poll())
+        return server
+
+    async def poll(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                delta = await in_thread(events.since, events.bus.cursor)
+            except Exception:
+                logger.exception('Не удалось получить новые события')
+                continue
+            for event in delta:
+                events.bus.publish(event)
+
+    async def read_request(self, reader):
+        request_line = await reader.readline()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        parts = request_line.decode('latin-1').split()
+        if len(parts) < 2:
+            return '', urlsplit(''), headers
+        return parts[0], urlsplit(parts[1]), headers
+
+    def response_head(self, status, headers, extra=()):
+        lines = [f'HTTP/1.1 {status}', *extra]
+        origin = headers.get('origin')
+        if origin in settings.SSE_ALLOWED_ORIGINS:
+            lines += [f'Access-Control-Allow-Origin: {origin}',
+                      'Access-Control-Allow-Credentials: true']
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode()
+
+    async def handle(self, reader, writer):
+        try:
+            method, url, headers = await asyncio.wait_for(
+                self.read_request(reader), HEADER_TIMEOUT)
+        except (asyncio.TimeoutError, ConnectionError):
+            writer.close()
+            return
+        if method != 'GET' or url.path != settings.SSE_PATH:
+            writer.write(self.response_head(
+                '404 Not Found', headers,
+                ('Content-Length: 0', 'Connection: close')))
+            await writer.drain()
+            writer.close()
+            return
+        query = parse_qs(url.query)
+        channels = await in_thread(
+            resolve_channels, query.get('channels', [''])[0],
+            headers.get('cookie', ''))
+        client = Client(channels, asyncio.get_running_loop())
+        events.bus.subscribe(client.offer)
+        self.clients += 1
+        try:
+            await self.stream(client, reader, writer, headers, headers.get(
+                'last-event-id') or query.get('last_event_id', [''])[0])
+        except ConnectionError:
+            pass
+        finally:
+            self.clients -= 1
+            events.bus.unsubscribe(client.offer)
+            writer.close()
+
+    async def stream(self, client, reader, writer, headers, last_event_id):
+        # Заголовки запроса нужны для CORS: страница открыта с другого
+        # origin, и без них браузер отвергнет поток.
+        writer.write(self.response_head('200 OK', headers, (
+            'Content-Type: text/event-stream',
+            'Cache-Control: no-cache',
+            'Connection: keep-alive',
+            'X-Accel-Buffering: no',
+        )))
+        writer.write(f'retry: {RETRY_MS}\n\n'.encode())
+        cursor = events.decode_cursor(last_event_id)
+        if cursor is not None:
+            # Подписка уже оформлена, поэтому между дельтой и живыми
+            # событиями нет дыры, а повторы отсекает client.sent.
+            client.sent = cursor
+            for event in await in_thread(events.since, cursor):
+                if event.channels & client.channels:
+                    frame = client.format(event)
+                    if frame:
+                        writer.write(frame)
+        await writer.drain()
+        # Клиент ничего не шлёт после заголовков: конец потока — отключение.
+        closed = asyncio.create_task(reader.read())
+        try:
+            while client.queue is not None and not closed.done():
+                getter = asyncio.create_task(client.queue.get())
+                done, _ = await asyncio.wait(
+                    {getter, closed}, timeout=self.keepalive,
+                    return_when=asyncio.FIRST_COMPLETED)
+                if getter not in done:
+                    getter.cancel()
+                    if closed not in done:
+                        writer.write(b': keepalive\n\n')
+                        await writer.drain()
+                    continue
+                frame = client.format(getter.result())
+                if frame is not None:
+                    writer.write(frame)
+                    await writer.drain()
+        finally:
+            closed.cancel()
+
+
+async def serve(host, port):
+    live = LiveServer()
+    server = await live.start(host, port)
+    logger.info('SSE слушает %s:%s', host, port)
+    async with server:
+        await server.serve_forever()
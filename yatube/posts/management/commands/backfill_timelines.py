@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import Follow
+
+
+class Command(BaseCommand):
+    help = 'Заново собирает домашние ленты подписчиков в кэше'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='id пользователя; по умолчанию все, у кого есть подписки')
+
+    def handle(self, *args, **options):
+        user_ids = options['users']
+        if not user_ids:
+            user_ids = (Follow.objects.values_list('user_id', flat=True)
+                        .distinct().iterator())
+        rebuilt = 0
+        for user_id in user_ids:
+            timeline.rebuild(user_id)
+            rebuilt += 1
+        self.stdout.write(f'Пересобрано лент: {rebuilt}')
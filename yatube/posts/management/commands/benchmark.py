@@ -0,0 +1,62 @@
+import json
+import platform
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу синтетическими данными и замеряет страницы '
+            'posts: перцентили времени, число запросов, память')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true',
+                            help='сначала сгенерировать данные')
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='подписок на пользователя')
+        parser.add_argument('--comments', type=int, default=200_000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--random-seed', type=int, default=0)
+        parser.add_argument('--requests', type=int, default=50,
+                            help='замеров на страницу')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--cold', action='store_true',
+                            help='очищать кэш перед каждым запросом')
+        parser.add_argument('--output', help='куда сохранить JSON')
+        parser.add_argument('--compare', help='JSON прошлого прогона')
+
+    def handle(self, *args, **options):
+        volumes = {key: options[key]
+                   for key in ('users', 'posts', 'follows', 'comments')}
+        if options['seed']:
+            benchmark.seed(batch_size=options['batch_size'],
+                           random_seed=options['random_seed'],
+                           stdout=self.stdout, **volumes)
+        report = {
+            'meta': {
+                'revision': benchmark.git_revision(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'seeded': options['seed'],
+                'volumes': volumes,
+                'requests': options['requests'],
+                'cold_cache': options['cold'],
+            },
+            'views': benchmark.measure(options['requests'],
+                                       options['warmup'], options['cold']),
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)
+            for line in benchmark.compare(report, baseline):
+                self.stdout.write(line)
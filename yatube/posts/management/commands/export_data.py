@@ -0,0 +1,50 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает записи, комментарии или подписки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=bulk.KINDS)
+        parser.add_argument('--output', help='файл; по умолчанию stdout')
+        parser.add_argument('--format', choices=('jsonl', 'csv'),
+                            default='jsonl')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--checkpoint',
+                            help='файл с последним выгруженным id и '
+                                 'смещением в выходном файле; '
+                                 'при повторном запуске выгрузка '
+                                 'дописывается с этого места')
+
+    def handle(self, *args, **options):
+        checkpoint = bulk.Checkpoint(options['checkpoint'])
+        after_id = checkpoint.read()
+        offset = checkpoint.offset()
+        _, fields = bulk.KINDS[options['kind']]
+        output = options['output']
+        if output and after_id and offset is not None:
+            # Строки после контрольной точки выгрузятся заново.
+            os.truncate(output, offset)
+        file = (open(output, 'a' if after_id else 'w', encoding='utf-8',
+                     newline='') if output else sys.stdout)
+        exported = 0
+        try:
+            records = bulk.export_rows(options['kind'], after_id,
+                                       options['chunk_size'])
+            for exported, last_id in enumerate(bulk.write_records(
+                    records, file, options['format'], fields,
+                    header=not after_id), start=1):
+                if exported % options['chunk_size'] == 0:
+                    file.flush()
+                    checkpoint.write(
+                        last_id, file.tell() if output else None)
+        finally:
+            if output:
+                file.close()
+        checkpoint.clear()
+        self.stderr.write(f'Выгружено: {exported}')
@@ -0,0 +1,23 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Нарезает недостающие копии для картинок из media/posts/'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='перенарезать все копии, даже уже готовые')
+
+    def handle(self, *args, **options):
+        files = []
+        if default_storage.exists('posts'):
+            _, files = default_storage.listdir('posts')
+        generated = 0
+        for filename in files:
+            if thumbnails.generate(f'posts/{filename}', options['force']):
+                generated += 1
+        self.stdout.write(f'Обработано картинок: {generated}')
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = ('Потоково загружает записи, комментарии или подписки пачками '
+            'bulk_create с контрольной точкой для продолжения после сбоя')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=bulk.KINDS)
+        parser.add_argument('input')
+        parser.add_argument('--format', choices=('jsonl', 'csv'),
+                            default='jsonl')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--create-users', action='store_true',
+                            help='заводить неизвестных авторов')
+        parser.add_argument('--restart', action='store_true',
+                            help='игнорировать сохранённую контрольную '
+                                 'точку и начать с начала файла')
+
+    def handle(self, *args, **options):
+        checkpoint = bulk.Checkpoint(f"{options['input']}.checkpoint")
+        if options['restart']:
+            checkpoint.clear()
+        with open(options['input'], encoding='utf-8', newline='') as file:
+            inserted, skipped, invalid = bulk.import_records(
+                bulk.read_records(file, options['format']),
+                options['kind'], checkpoint, options['batch_size'],
+                options['create_users'])
+        checkpoint.clear()
+        if invalid:
+            self.stderr.write(f'Битых строк пропущено: {invalid}')
+        self.stdout.write(
+            f'Загружено: {inserted}, пропущено: {skipped}. Поисковый '
+            'индекс обновится после rebuild_search_index.')
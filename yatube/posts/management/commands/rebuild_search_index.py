@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+from posts.models import Comment, Post, SearchEntry
+
+
+class Command(BaseCommand):
+    help = 'Заново строит поисковый индекс по записям и комментариям'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            SearchEntry.objects.all().delete()
+            for post in Post.objects.iterator():
+                search.index_post(post)
+            for comment in Comment.objects.iterator():
+                search.index_comment(comment)
+        self.stdout.write(
+            f'Строк в индексе: {SearchEntry.objects.count()}')
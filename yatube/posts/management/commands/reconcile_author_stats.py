@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import stats, versions
+from posts.models import AuthorStats, User
+
+
+class Command(BaseCommand):
+    help = ('Сверяет счётчики AuthorStats и комментариев записей '
+            'с таблицами и чинит расхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='только показать расхождения, ничего не сохранять')
+
+    def handle(self, *args, **options):
+        counts = stats.grouped_counts()
+        existing = AuthorStats.objects.in_bulk()
+        drifted, missing = [], []
+        for user_id in User.objects.values_list('id', flat=True).iterator():
+            expected = dict.fromkeys(stats.COUNTERS, 0)
+            expected.update(counts.get(user_id, {}))
+            row = existing.get(user_id)
+            if row is None:
+                missing.append(AuthorStats(author_id=user_id, **expected))
+                continue
+            if any(getattr(row, field) != value
+                   for field, value in expected.items()):
+                for field, value in expected.items():
+                    setattr(row, field, value)
+                drifted.append(row)
+        if not options['dry_run']:
+            with transaction.atomic():
+                AuthorStats.objects.bulk_create(missing, batch_size=500)
+                AuthorStats.objects.bulk_update(
+                    drifted, list(stats.COUNTERS), batch_size=500)
+            for row in drifted:
+                versions.bump('stats', row.author_id)
+            comments = stats.reconcile_comment_counts()
+            self.stdout.write(f'Счётчиков комментариев исправлено: {comments}')
+        self.stdout.write(
+            f'Исправлено: {len(drifted)}, создано: {len(missing)}')
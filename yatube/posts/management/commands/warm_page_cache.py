@@ -0,0 +1,38 @@
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from posts import pagecache
+
+
+class Command(BaseCommand):
+    help = ('Прогревает кэш анонимных страниц после выкладки. Имеет смысл '
+            'только с общим для процессов кэшем (core.cache.TieredCache '
+            'или внешний бэкенд): локальный кэш умрёт вместе с командой')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top', type=int, default=100,
+            help='сколько самых популярных страниц открыть')
+        parser.add_argument(
+            '--allow-local', action='store_true',
+            help='греть и кэш, локальный для этого процесса')
+
+    def handle(self, *args, **options):
+        if (isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+                and not options['allow_local']):
+            raise CommandError(
+                'Кэш страниц локален для процесса, прогрев пропадёт '
+                'с выходом команды. Включите общий кэш '
+                '(YATUBE_SHARED_CACHE) или передайте --allow-local')
+        client = Client()
+        warmed = 0
+        for path in pagecache.popular_paths(options['top']):
+            response = client.get(path)
+            if response.status_code == 200:
+                warmed += 1
+            else:
+                self.stderr.write(f'{path}: ответ {response.status_code}')
+        self.stdout.write(f'Прогрето страниц: {warmed}')
@@ -14,6 +14,25 @@ class Group(models.Model):
         return (self.title)
 
 
+class PostQuerySet(models.QuerySet):
+    """Профили выборок записей под конкретные страницы."""
+
+    def for_feed(self):
+        """Лента: автор и группа нужны каждой карточке."""
+        return self.select_related('author', 'group').order_by(
+            '-pub_date', '-id')
+
+    def for_detail(self):
+        return self.select_related('author', 'group')
+
+
+class CommentQuerySet(models.QuerySet):
+
+    def for_post(self):
+        """Комментарии под записью вместе с их авторами."""
+        return self.select_related('author').order_by('pub_date', 'id')
+
+
 class Post(CreatedTimeModel):
     text = models.TextField(
         help_text='Введите текст поста'
@@ -41,9 +60,39 @@ class Post(CreatedTimeModel):
         blank=True
     )
 
+    # Меняется сигналами комментариев, страница записи не делает COUNT.
+    comments_count = models.PositiveIntegerField(
+        'Комментариев', default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            # Покрывает keyset-пагинацию лент по (pub_date, id).
+            models.Index(fields=['pub_date', 'id'],
+                         name='post_pub_date_id_idx'),
+            # Ленты автора и группы: фильтр и сортировка по одному индексу.
+            models.Index(fields=['author', 'pub_date', 'id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', 'pub_date', 'id'],
+                         name='post_group_pub_date_idx'),
+        ]
+
     def __str__(self):
         return(self.text[:15])
 
+    def save(self, *args, **kwargs):
+        # Счётчик меняют только UPDATE с F(): полное сохранение записи,
+        # прочитанной раньше, затёрло бы чужие комментарии.
+        if (not self._state.adding and not args
+                and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'comments_count']
+        super().save(*args, **kwargs)
+
 
 class Comment(CreatedTimeModel):
     text = models.TextField(
@@ -62,6 +111,15 @@ class Comment(CreatedTimeModel):
         verbose_name='Запись'
     )
 
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Комментарии записи листаются курсором по (pub_date, id).
+            models.Index(fields=['post', 'pub_date', 'id'],
+                         name='comment_post_pub_date_idx'),
+        ]
+
 
 class Follow(models.Model):
     author = models.ForeignKey(
@@ -76,3 +134,78 @@ class Follow(models.Model):
         verbose_name='Подписчик',
         on_delete=models.CASCADE
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики автора, обновляются сигналами."""
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор'
+    )
+    posts_count = models.PositiveIntegerField('Записей', default=0)
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+
+class TrendingScore(models.Model):
+    """Рейтинг популярности записи в логарифмической шкале."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+        verbose_name='Запись'
+    )
+    # Копия группы записи: top-K группы берётся одним индексом.
+    group = models.ForeignKey(
+        Group,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='Группа'
+    )
+    score = models.FloatField('Рейтинг')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['score'], name='trending_score_idx'),
+            models.Index(fields=['group', 'score'],
+                         name='trending_group_score_idx'),
+        ]
+
+
+class SearchEntry(models.Model):
+    """Строка инвертированного индекса: основа слова -> запись."""
+    term = models.CharField('Основа слова', max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_entries',
+        verbose_name='Запись'
+    )
+    comment = models.ForeignKey(
+        Comment,
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='search_entries',
+        verbose_name='Комментарий'
+    )
+    weight = models.PositiveIntegerField('Вес')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'post'],
+                         name='search_term_post_idx'),
+        ]
@@ -0,0 +1,133 @@
+"""Кэш целых страниц, общий для всех посетителей.
+
+Ключ — путь с query string. Страница рендерится один раз с маркерами
+вместо персональных фрагментов (core.holes), а перед отдачей маркеры
+заполняются для текущего пользователя. Вместе с ответом сохраняются
+версии, от которых страница зависит (те же, что входят в ETag), снятые
+до её отрисовки. Сигналы на Post, Comment, Group, Follow и User
+увеличивают эти версии, и устаревшая страница при следующем чтении
+просто не совпадает с ними. Запросы с flash-сообщениями идут мимо кэша.
+
+Страница для кэша рендерится по основной базе: снимок отстающей реплики
+с новыми версиями остался бы в кэше до следующей записи. Запрос,
+который должен видеть свою свежую запись (core.routers.is_pinned), не
+берёт страницу из кэша и не получает 304.
+"""
+import hashlib
+from functools import wraps
+from itertools import chain, zip_longest
+
+from core import holes, routers
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from . import versions
+from .conditional import make_etag, shared_versions
+from .models import AuthorStats, Group, Post
+
+PAGE_KEY = 'page:{}'
+BYPASS_COOKIES = ('messages',)
+
+
+def page_key(path):
+    return PAGE_KEY.format(hashlib.md5(path.encode()).hexdigest())
+
+
+def is_cacheable(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    return not any(name in request.COOKIES for name in BYPASS_COOKIES)
+
+
+def cached_page(request):
+    """(версии страницы, ответ), если ни одна версия не менялась."""
+    entry = cache.get(page_key(request.get_full_path()))
+    if entry is None:
+        return None
+    pairs, known, response = entry
+    if versions.get_versions(known) != known:
+        return None
+    return pairs, response
+
+
+def personalize(request, response, etag=None):
+    """Заполняет персональные фрагменты и ставит ETag пользователя."""
+    content = response.content.decode(response.charset)
+    response.content = holes.fill(content, request)
+    if etag is not None:
+        response['ETag'] = etag
+    return response
+
+
+def cache_shared_page(versions_func):
+    """Отдаёт сохранённую страницу, пока её версии не изменились.
+
+    versions_func(request, **kwargs) — пары версий страницы, как для
+    ETag, или None, если объекта нет.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not is_cacheable(request):
+                return view(request, *args, **kwargs)
+            cached = None if routers.is_pinned() else cached_page(request)
+            if cached is not None:
+                pairs, response = cached
+                etag = quote_etag(make_etag(request, pairs))
+                conditional = get_conditional_response(
+                    request, etag=etag, response=response)
+                if conditional is not response:
+                    return conditional
+                return personalize(request, response, etag)
+            pairs = versions_func(request, *args, **kwargs)
+            if pairs is None:
+                return view(request, *args, **kwargs)
+            # Версии снимаются до отрисовки: запись, попавшая между ними
+            # и рендерингом, сделает сохранённую страницу устаревшей.
+            known = versions.get_versions(shared_versions(pairs))
+            request.page_versions = pairs
+            request.punch_holes = True
+            routers.read_primary()
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                request.punch_holes = False
+            if (response.status_code == 200 and not response.streaming
+                    and not response.cookies):
+                cache.set(page_key(request.get_full_path()),
+                          (pairs, known, response),
+                          settings.POSTS_PAGE_CACHE_TIMEOUT)
+            if response.status_code == 200 and not response.streaming:
+                response = personalize(request, response)
+            return response
+        return wrapper
+    return decorator
+
+
+def popular_paths(limit, index_pages=3):
+    """Пути самых посещаемых страниц для прогрева кэша."""
+    index = reverse('yatube_posts:index')
+    pages = [index] + [f'{index}?page={number}'
+                       for number in range(2, index_pages + 1)]
+    groups = [
+        reverse('yatube_posts:group_posts', kwargs={'slug': slug})
+        for slug in Group.objects.annotate(posts=Count('group_posts'))
+        .order_by('-posts').values_list('slug', flat=True)[:limit]
+    ]
+    profiles = [
+        reverse('yatube_posts:profile', kwargs={'username': username})
+        for username in AuthorStats.objects.order_by(
+            '-followers_count', '-posts_count').values_list(
+            'author__username', flat=True)[:limit]
+    ]
+    posts = [
+        reverse('yatube_posts:post_detail', kwargs={'post_id': pk})
+        for pk in Post.objects.values_list('pk', flat=True)[:limit]
+    ]
+    # Вперемешку, чтобы в первые limit попали страницы всех видов.
+    mixed = chain.from_iterable(zip_longest(pages, groups, profiles, posts))
+    return [path for path in mixed if path is not None][:limit]
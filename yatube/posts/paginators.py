@@ -0,0 +1,217 @@
+import base64
+import binascii
+from math import ceil
+
+from django.core.paginator import (EmptyPage, InvalidPage, Page,
+                                   PageNotAnInteger, Paginator)
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_token(*parts):
+    """Упаковывает значения в непрозрачный url-safe токен."""
+    raw = '|'.join(str(part) for part in parts).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_token(token, size):
+    """Распаковывает токен в список строк или возвращает None."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        parts = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return None
+    return parts if len(parts) == size else None
+
+
+def encode_cursor(post):
+    """Кодирует позицию записи (pub_date, id) в непрозрачный токен."""
+    return encode_token(post.pub_date.isoformat(), post.pk)
+
+
+def decode_cursor(token):
+    """Возвращает (pub_date, id) из токена или None, если токен битый."""
+    parts = decode_token(token, 2)
+    if parts is None:
+        return None
+    try:
+        pub_date = parse_datetime(parts[0])
+        pk = int(parts[1])
+    except ValueError:
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+def older_than(queryset, position):
+    """Записи ленты строго после позиции (pub_date, id)."""
+    pub_date, pk = position
+    return queryset.filter(
+        Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk))
+
+
+def newer_than(queryset, position):
+    """Строки строго новее позиции (pub_date, id)."""
+    pub_date, pk = position
+    return queryset.filter(
+        Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, id__gt=pk))
+
+
+def page_window(number, num_pages, on_each_side=2, on_ends=1):
+    """Номера страниц вокруг текущей и по краям; None — это пропуск «…».
+
+    Вместо ссылки на каждую из тысяч страниц выводится не больше
+    2 * (on_each_side + on_ends) + 3 элементов.
+    """
+    if num_pages <= 2 * (on_each_side + on_ends) + 1:
+        return list(range(1, num_pages + 1))
+    window = []
+    if number > on_each_side + on_ends + 1:
+        window.extend(range(1, on_ends + 1))
+        window.append(None)
+        window.extend(range(number - on_each_side, number + 1))
+    else:
+        window.extend(range(1, number + 1))
+    if number < num_pages - on_each_side - on_ends:
+        window.extend(range(number + 1, number + on_each_side + 1))
+        window.append(None)
+        window.extend(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        window.extend(range(number + 1, num_pages + 1))
+    return window
+
+
+class EstimatedPage(Page):
+    """Страница, у которой следующая определена по лишней строке."""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class WindowedPaginator(Paginator):
+    """Paginator, который отдаёт окно номеров вместо полного page_range.
+
+    Если задан estimated_count, оценка идёт только в подпись
+    «примерно N стр.»: страница читается с одной лишней строкой, и
+    по ней видно, есть ли следующая. Заниженная оценка не обрезает
+    навигацию, а COUNT(*) выполняется лишь для номера за концом ленты.
+    """
+
+    on_each_side = 2
+    on_ends = 1
+    # Оценка размера ленты (например, из sqlite_stat1) или None.
+    estimated_count = None
+
+    @property
+    def count_is_estimate(self):
+        return self.estimated_count is not None
+
+    def estimated_pages(self, page=None):
+        pages = max(1, ceil(self.estimated_count / self.per_page))
+        if page is not None:
+            pages = max(pages, page.number + page.has_next())
+        return pages
+
+    def validate_number(self, number):
+        if not self.count_is_estimate:
+            return super().validate_number(number)
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы не целое число')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return number
+
+    def page(self, number):
+        if not self.count_is_estimate:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('На этой странице нет результатов')
+        return EstimatedPage(rows[:self.per_page], number, self,
+                             len(rows) > self.per_page)
+
+    def get_page(self, number):
+        if not self.count_is_estimate:
+            return super().get_page(number)
+        try:
+            return self.page(number)
+        except PageNotAnInteger:
+            return self.page(1)
+        except EmptyPage:
+            # Номер за концом ленты: последняя страница по точному COUNT(*).
+            return self.page(self.num_pages)
+
+    def page_window(self, number, page=None):
+        num_pages = (self.estimated_pages(page) if self.count_is_estimate
+                     else self.num_pages)
+        return page_window(number, num_pages, self.on_each_side,
+                           self.on_ends)
+
+
+class CursorPage(Page):
+    """Страница ленты без OFFSET: ссылки ведут на соседние курсоры."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        super().__init__(object_list, 1, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def next_page_number(self):
+        raise InvalidPage('Курсорная страница не имеет номера')
+
+    previous_page_number = next_page_number
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (pub_date, id).
+
+    Стоимость любой страницы равна стоимости первой: запрос идёт
+    по индексу (pub_date, id) и не делает ни COUNT(*), ни OFFSET.
+    """
+
+    def __init__(self, object_list, per_page):
+        super().__init__(
+            object_list.order_by('-pub_date', '-id'), per_page)
+
+    def cursor_page(self, after=None, before=None):
+        queryset = self.object_list
+        position = decode_cursor(after or before or '')
+        backwards = before is not None and position is not None
+        if position is not None:
+            if backwards:
+                queryset = newer_than(queryset, position).order_by(
+                    'pub_date', 'id')
+            else:
+                queryset = older_than(queryset, position)
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or backwards:
+                next_cursor = encode_cursor(rows[-1])
+            if (has_more and backwards) or (position and not backwards):
+                previous_cursor = encode_cursor(rows[0])
+        return CursorPage(rows, self, next_cursor, previous_cursor)
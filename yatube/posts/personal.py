@@ -0,0 +1,26 @@
+"""Персональные фрагменты страниц posts (см. core.holes)."""
+from core import holes
+from django.template.loader import render_to_string
+
+from .forms import CommentForm
+from .models import Follow
+
+
+@holes.register('follow_button')
+def follow_button(request, username):
+    if not request.user.is_authenticated:
+        return ''
+    following = Follow.objects.filter(
+        user=request.user, author__username=username).exists()
+    return render_to_string(
+        'posts/includes/follow_button.html',
+        {'username': username, 'following': following}, request=request)
+
+
+@holes.register('comment_form')
+def comment_form(request, post_id):
+    if not request.user.is_authenticated:
+        return ''
+    return render_to_string(
+        'posts/includes/comment_form.html',
+        {'post_id': post_id, 'form': CommentForm()}, request=request)
@@ -0,0 +1,176 @@
+"""Полнотекстовый поиск по записям и комментариям.
+
+Собственный инвертированный индекс: текст разбивается на слова, слова
+приводятся к основе стеммером Портера для русского языка, и для каждой
+пары (основа, запись) хранится вес в SearchEntry. Слова из текста записи
+весят больше, чем слова из комментариев к ней. Ранжирование — сумма
+весов, умноженная на idf основы; найдены должны быть все слова запроса.
+"""
+import math
+import re
+from collections import Counter
+
+from core import jobs
+from django.core.paginator import Paginator
+from django.db.models import (Case, Count, ExpressionWrapper, F,
+                              FloatField, Q, Sum, Value, When)
+
+from . import counting
+from .models import Comment, Post, SearchEntry
+from .paginators import CursorPage, decode_token, encode_token
+
+POST_WEIGHT = 3
+COMMENT_WEIGHT = 1
+MAX_TERM_LENGTH = 64
+
+WORD_RE = re.compile(r'\w+')
+STOP_WORDS = frozenset(
+    'а без в во вот да для до если же за и из или к как ко ли на над не '
+    'ни но о об от по под при про с со так то у что чтобы это'.split())
+
+RVRE = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$')
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)$')
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|'
+    r'((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$')
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|'
+    r'ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$')
+DERIVATIONAL = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+DERIVATIONAL_SUFFIX = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+
+
+def stem(word):
+    """Основа русского слова по алгоритму Портера (Snowball)."""
+    word = word.lower().replace('ё', 'е')
+    match = RVRE.match(word)
+    if match is None:
+        return word
+    head, rv = match.groups()
+    cut = PERFECTIVE_GERUND.sub('', rv, 1)
+    if cut == rv:
+        rv = REFLEXIVE.sub('', rv, 1)
+        cut = ADJECTIVE.sub('', rv, 1)
+        if cut != rv:
+            rv = PARTICIPLE.sub('', cut, 1)
+        else:
+            cut = VERB.sub('', rv, 1)
+            rv = NOUN.sub('', rv, 1) if cut == rv else cut
+    else:
+        rv = cut
+    rv = re.sub('и$', '', rv, 1)
+    if DERIVATIONAL.match(rv):
+        rv = DERIVATIONAL_SUFFIX.sub('', rv, 1)
+    cut = re.sub('ь$', '', rv, 1)
+    if cut == rv:
+        rv = SUPERLATIVE.sub('', rv, 1)
+        rv = re.sub('нн$', 'н', rv, 1)
+    else:
+        rv = cut
+    return head + rv
+
+
+def terms(text):
+    """Основы значимых слов текста в порядке появления."""
+    return [
+        stem(word)[:MAX_TERM_LENGTH]
+        for word in WORD_RE.findall(text.lower())
+        if len(word) > 1 and word not in STOP_WORDS
+    ]
+
+
+def _entries(text, weight, **fields):
+    return [
+        SearchEntry(term=term, weight=count * weight, **fields)
+        for term, count in Counter(terms(text)).items()
+    ]
+
+
+def index_post(post):
+    SearchEntry.objects.filter(post=post, comment=None).delete()
+    SearchEntry.objects.bulk_create(_entries(post.text, POST_WEIGHT,
+                                             post=post))
+
+
+def index_comment(comment):
+    SearchEntry.objects.filter(comment=comment).delete()
+    SearchEntry.objects.bulk_create(_entries(
+        comment.text, COMMENT_WEIGHT, post_id=comment.post_id,
+        comment=comment))
+
+
+@jobs.task()
+def reindex_post(post_id):
+    post = Post.objects.filter(pk=post_id).only('id', 'text').first()
+    if post is not None:
+        index_post(post)
+
+
+@jobs.task()
+def reindex_comment(comment_id):
+    comment = Comment.objects.filter(pk=comment_id).only(
+        'id', 'post_id', 'text').first()
+    if comment is not None:
+        index_comment(comment)
+
+
+def ranked(query, group=None, author=None):
+    """Пары (post_id, score) по убыванию релевантности."""
+    query_terms = set(terms(query))
+    if not query_terms:
+        return None
+    entries = SearchEntry.objects.filter(term__in=query_terms)
+    if group is not None:
+        entries = entries.filter(post__group=group)
+    if author is not None:
+        entries = entries.filter(post__author=author)
+    total = counting.total_posts() or 1
+    frequencies = (SearchEntry.objects.filter(term__in=query_terms)
+                   .values_list('term')
+                   .annotate(posts=Count('post', distinct=True)))
+    idf = [
+        When(term=term, then=Value(math.log(1 + total / posts)))
+        for term, posts in frequencies
+    ]
+    if len(idf) < len(query_terms):
+        return None
+    return (entries.values('post_id')
+            .annotate(matched=Count('term', distinct=True),
+                      score=Sum(ExpressionWrapper(
+                          F('weight') * Case(*idf), FloatField())))
+            .filter(matched=len(query_terms))
+            .order_by('-score', '-post_id')
+            .values_list('post_id', 'score'))
+
+
+def search_page(query, per_page, after=None, group=None, author=None):
+    """Страница результатов с курсором (score, id) на следующую."""
+    paginator = Paginator([], per_page)
+    rows = ranked(query, group, author)
+    if rows is None:
+        return CursorPage([], paginator)
+    position = decode_token(after or '', 2)
+    if position is not None:
+        try:
+            score, pk = float(position[0]), int(position[1])
+        except ValueError:
+            pass
+        else:
+            rows = rows.filter(Q(score__lt=score)
+                               | Q(score=score, post_id__lt=pk))
+    rows = list(rows[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_token(repr(rows[-1][1]), rows[-1][0])
+    posts = Post.objects.for_feed().in_bulk([pk for pk, _ in rows])
+    return CursorPage([posts[pk] for pk, _ in rows if pk in posts],
+                      paginator, next_cursor)
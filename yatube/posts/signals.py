@@ -0,0 +1,173 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (events, search, stats, thumbnails, timeline, trending,
+               versions)
+from .models import Comment, Follow, Group, Post, TrendingScore, User
+
+
+@receiver(post_save, sender=Post)
+def push_post_to_timelines(sender, instance, created, **kwargs):
+    if created and settings.POSTS_TIMELINE_ENABLED:
+        transaction.on_commit(lambda: timeline.fan_out_post.enqueue(
+            instance.pk, dedup_key=f'fan_out:{instance.pk}'))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def reset_follower_timeline(sender, instance, **kwargs):
+    if settings.POSTS_TIMELINE_ENABLED:
+        timeline.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Follow)
+def increment_author_stats(sender, instance, created, **kwargs):
+    if created:
+        update_author_stats(instance, 1)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Follow)
+def decrement_author_stats(sender, instance, **kwargs):
+    update_author_stats(instance, -1)
+
+
+def update_author_stats(instance, delta):
+    if isinstance(instance, Follow):
+        stats.change(instance.author_id, 'followers_count', delta)
+        stats.change(instance.user_id, 'following_count', delta)
+    elif isinstance(instance, Post):
+        stats.change(instance.author_id, 'posts_count', delta)
+    else:
+        stats.change(instance.author_id, 'comments_count', delta)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_version(sender, instance, **kwargs):
+    versions.bump('post', instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_version(sender, instance, **kwargs):
+    versions.bump('group', instance.pk)
+    versions.bump('site', 'groups')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_user_version(sender, instance, update_fields=None, **kwargs):
+    # Вход пользователя обновляет только last_login, карточки не меняются.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    versions.bump('user', instance.pk)
+    if not kwargs.get('created'):
+        versions.bump('site', 'users')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comments_version(sender, instance, **kwargs):
+    versions.bump('comments', instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_follows_version(sender, instance, **kwargs):
+    versions.bump('follows', instance.user_id)
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, **kwargs):
+    search.reindex_post.enqueue(instance.pk,
+                                dedup_key=f'index_post:{instance.pk}')
+
+
+@receiver(post_save, sender=Comment)
+def index_comment_text(sender, instance, **kwargs):
+    # Удалённые записи и комментарии уходят из индекса каскадом.
+    search.reindex_comment.enqueue(
+        instance.pk, dedup_key=f'index_comment:{instance.pk}')
+
+
+@receiver(post_save, sender=Post)
+def prepare_image_renditions(sender, instance, **kwargs):
+    if instance.image and thumbnails.missing_renditions(instance.image.name):
+        thumbnails.schedule(instance.image.name)
+
+
+@receiver(pre_save, sender=Post)
+def bump_previous_group_feed(sender, instance, raw=False, **kwargs):
+    # Запись, перенесённая в другую группу, уходит и из прежней ленты.
+    if raw or instance.pk is None:
+        return
+    previous = Post.objects.filter(pk=instance.pk).values_list(
+        'group_id', flat=True).first()
+    if previous and previous != instance.group_id:
+        versions.bump_feeds(instance.author_id, previous)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_feed_versions(sender, instance, **kwargs):
+    versions.bump_feeds(instance.author_id, instance.group_id)
+
+
+@receiver(post_save, sender=Post)
+def score_new_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        trending.record.enqueue(instance.pk, 'post',
+                                instance.pub_date.timestamp())
+    else:
+        TrendingScore.objects.filter(post_id=instance.pk).exclude(
+            group_id=instance.group_id).update(group_id=instance.group_id)
+
+
+@receiver(post_save, sender=Comment)
+def score_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.record.enqueue(instance.post_id, 'comment',
+                                instance.pub_date.timestamp())
+
+
+@receiver(post_save, sender=Follow)
+def score_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.record_follow(instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def increment_comments_count(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comments_count(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id, comments_count__gt=0).update(
+        comments_count=F('comments_count') - 1)
+
+
+@receiver(post_save, sender=Post)
+def publish_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        event = events.post_event(instance.pk, instance.author_id,
+                                  instance.group_id)
+        transaction.on_commit(lambda: events.bus.publish(event))
+
+
+@receiver(post_save, sender=Comment)
+def publish_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        event = events.comment_event(instance.pk, instance.post_id)
+        transaction.on_commit(lambda: events.bus.publish(event))
@@ -0,0 +1,117 @@
+"""Счётчики автора без COUNT(*) на каждый просмотр страницы.
+
+Сигналы меняют уже существующие строки AuthorStats на +-1, а сама строка
+создаётся при первом чтении с точным пересчётом. Поэтому удаление
+пользователя каскадом не может «воскресить» строку его статистики.
+"""
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from . import versions
+from .models import AuthorStats, Comment, Follow, Post
+
+COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'comments_count': (Comment, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def change(user_id, field, delta):
+    with transaction.atomic():
+        AuthorStats.objects.filter(author_id=user_id).update(
+            **{field: F(field) + delta})
+    versions.bump('stats', user_id)
+
+
+def exact_counts(user_id):
+    return {
+        field: model.objects.filter(**{f'{owner}_id': user_id}).count()
+        for field, (model, owner) in COUNTERS.items()
+    }
+
+
+def reconcile(user_id):
+    """Пересчитывает счётчики одного автора по исходным таблицам."""
+    with transaction.atomic():
+        counts = exact_counts(user_id)
+        stats, created = AuthorStats.objects.select_for_update(
+        ).get_or_create(author_id=user_id, defaults=counts)
+        if not created and any(getattr(stats, field) != value
+                               for field, value in counts.items()):
+            for field, value in counts.items():
+                setattr(stats, field, value)
+            stats.save()
+            versions.bump('stats', user_id)
+    return stats
+
+
+def for_author(user):
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return reconcile(user.pk)
+
+
+def grouped_counts(user_ids=None):
+    """Точные значения счётчиков одной агрегацией на счётчик.
+
+    user_ids ограничивает пересчёт указанными авторами.
+    """
+    counts = {}
+    for field, (model, owner) in COUNTERS.items():
+        rows = model.objects.order_by()
+        if user_ids is not None:
+            rows = rows.filter(**{f'{owner}_id__in': user_ids})
+        rows = (rows.values(owner).annotate(total=Count('id'))
+                .values_list(owner, 'total'))
+        for user_id, total in rows:
+            counts.setdefault(user_id, {})[field] = total
+    return counts
+
+
+def reconcile_authors(user_ids):
+    """Пересчитывает уже созданные строки AuthorStats указанных авторов.
+
+    Недостающие строки не создаются: их посчитает первое чтение.
+    """
+    user_ids = set(user_ids)
+    drifted = []
+    with transaction.atomic():
+        counts = grouped_counts(user_ids)
+        for row in AuthorStats.objects.select_for_update().filter(
+                author_id__in=user_ids):
+            expected = dict.fromkeys(COUNTERS, 0)
+            expected.update(counts.get(row.author_id, {}))
+            if any(getattr(row, field) != value
+                   for field, value in expected.items()):
+                for field, value in expected.items():
+                    setattr(row, field, value)
+                drifted.append(row)
+        AuthorStats.objects.bulk_update(drifted, list(COUNTERS))
+    for row in drifted:
+        versions.bump('stats', row.author_id)
+    return len(drifted)
+
+
+def reconcile_comment_counts(chunk_size=500, post_ids=None):
+    """Чинит Post.comments_count там, где он разошёлся с таблицей.
+
+    post_ids ограничивает проверку указанными записями.
+    """
+    counts = (Comment.objects.filter(post=OuterRef('pk')).order_by()
+              .values('post').annotate(total=Count('id')).values('total'))
+    exact = Coalesce(Subquery(counts), 0)
+    posts = Post.objects.all()
+    if post_ids is not None:
+        posts = posts.filter(pk__in=post_ids)
+    drifted = list(posts.annotate(exact=exact).exclude(
+        comments_count=F('exact')).values_list('id', flat=True))
+    for start in range(0, len(drifted), chunk_size):
+        chunk = drifted[start:start + chunk_size]
+        Post.objects.filter(pk__in=chunk).update(comments_count=exact)
+    for pk in drifted:
+        versions.bump('comments', pk)
+    return len(drifted)
@@ -0,0 +1,36 @@
+from django import template
+
+from posts.paginators import page_window as window
+
+register = template.Library()
+
+PAGINATION_PARAMS = ('page', 'after', 'before')
+
+
+@register.simple_tag(takes_context=True)
+def page_url(context, **params):
+    """Ссылка на другую страницу с сохранением остальных GET-параметров."""
+    query = context['request'].GET.copy()
+    for name in PAGINATION_PARAMS:
+        query.pop(name, None)
+    for name, value in params.items():
+        if value is not None:
+            query[name] = value
+    return '?' + query.urlencode()
+
+
+@register.simple_tag
+def page_window(page_obj):
+    """Окно номеров страниц; у курсорных страниц номеров нет."""
+    if getattr(page_obj, 'is_cursor', False):
+        return []
+    paginator = page_obj.paginator
+    if hasattr(paginator, 'page_window'):
+        return paginator.page_window(page_obj.number, page_obj)
+    return window(page_obj.number, paginator.num_pages)
+
+
+@register.simple_tag
+def estimated_pages(page_obj):
+    """Оценка числа страниц для подписи «примерно N стр.»."""
+    return page_obj.paginator.estimated_pages(page_obj)
@@ -0,0 +1,11 @@
+from django import template
+
+from posts.thumbnails import rendition_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def rendition(image, name):
+    """URL готовой копии картинки; на лету ничего не нарезается."""
+    return rendition_url(image.name if image else None, name)
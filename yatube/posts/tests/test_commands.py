@@ -0,0 +1,156 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import stats, versions
+from posts.models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+class BulkTransferCommandsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(5):
+            post = Post.objects.create(
+                author=cls.user, group=cls.group, text=f'Пост {i}')
+        Comment.objects.create(author=cls.reader, post=post, text='Коммент')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def export_and_wipe(self, file_format):
+        for kind in ('posts', 'comments', 'follows'):
+            call_command('export_data', kind, format=file_format,
+                         output=self.path(f'{kind}.{file_format}'),
+                         stderr=StringIO())
+        expected = list(Post.objects.order_by('id').values_list(
+            'id', 'author__username', 'group__slug', 'text', 'pub_date'))
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        return expected
+
+    def test_round_trip_keeps_data(self):
+        """Экспорт и импорт сохраняют записи, даты и связи."""
+        for file_format in ('jsonl', 'csv'):
+            with self.subTest(file_format=file_format):
+                expected = self.export_and_wipe(file_format)
+                for kind in ('posts', 'comments', 'follows'):
+                    call_command(
+                        'import_data', kind,
+                        self.path(f'{kind}.{file_format}'),
+                        format=file_format, batch_size=2, stdout=StringIO())
+                self.assertEqual(
+                    list(Post.objects.order_by('id').values_list(
+                        'id', 'author__username', 'group__slug', 'text',
+                        'pub_date')),
+                    expected)
+                self.assertEqual(Comment.objects.count(), 1)
+                self.assertTrue(Follow.objects.filter(
+                    user=self.reader, author=self.user))
+
+    def test_import_resumes_from_checkpoint(self):
+        """Импорт продолжается с сохранённой контрольной точки."""
+        self.export_and_wipe('jsonl')
+        source = self.path('posts.jsonl')
+        with open(f'{source}.checkpoint', 'w') as checkpoint:
+            checkpoint.write('3')
+        call_command('import_data', 'posts', source, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertFalse(os.path.exists(f'{source}.checkpoint'))
+
+    def test_resume_does_not_duplicate_rows_without_ids(self):
+        """Пачка без id, вставленная до сбоя, не вставляется повторно."""
+        post = Post.objects.first()
+        source = self.path('comments.jsonl')
+        with open(source, 'w', encoding='utf-8') as file:
+            for number in range(3):
+                file.write(json.dumps({
+                    'post': post.pk, 'author': 'reader',
+                    'text': f'Без id {number}',
+                    'pub_date': post.pub_date.isoformat()}) + '\n')
+        call_command('import_data', 'comments', source, batch_size=2,
+                     stdout=StringIO())
+        # Сбой после фиксации второй пачки, но до записи её точки.
+        with open(f'{source}.checkpoint', 'w') as checkpoint:
+            checkpoint.write('2')
+        call_command('import_data', 'comments', source, batch_size=2,
+                     stdout=StringIO())
+        self.assertEqual(
+            Comment.objects.filter(text__startswith='Без id').count(), 3)
+
+    def test_import_reconciles_touched_counters(self):
+        """Импорт пересчитывает счётчики авторов и записей пачки."""
+        post = Post.objects.first()
+        reader_stats = stats.for_author(self.reader)
+        source = self.path('comments.jsonl')
+        with open(source, 'w', encoding='utf-8') as file:
+            file.write(json.dumps({
+                'post': post.pk, 'author': 'reader', 'text': 'Новый',
+                'pub_date': post.pub_date.isoformat()}) + '\n')
+        call_command('import_data', 'comments', source, stdout=StringIO())
+        reader_stats.refresh_from_db()
+        self.assertEqual(reader_stats.comments_count,
+                         Comment.objects.filter(author=self.reader).count())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, post.comments.count())
+        self.assertFalse(AuthorStats.objects.filter(author=self.user))
+
+    def test_import_resets_feed_versions(self):
+        """Импорт без сигналов всё равно сбрасывает кэш лент."""
+        self.export_and_wipe('jsonl')
+        before = versions.get_version('feed', 'index')
+        call_command('import_data', 'posts', self.path('posts.jsonl'),
+                     stdout=StringIO())
+        self.assertNotEqual(versions.get_version('feed', 'index'), before)
+
+    def test_import_skips_broken_records(self):
+        """Строка с битым id записи пропускается, остальные загружаются."""
+        post = Post.objects.first()
+        source = self.path('comments.jsonl')
+        with open(source, 'w', encoding='utf-8') as file:
+            for post_id in ('не число', post.pk):
+                file.write(json.dumps({
+                    'post': post_id, 'author': 'reader', 'text': 'Новый',
+                    'pub_date': post.pub_date.isoformat()}) + '\n')
+        errors = StringIO()
+        call_command('import_data', 'comments', source, stdout=StringIO(),
+                     stderr=errors)
+        self.assertEqual(Comment.objects.filter(text='Новый').count(), 1)
+        self.assertIn('Битых строк пропущено: 1', errors.getvalue())
+
+    def test_export_resume_drops_partial_tail(self):
+        """Продолжение выгрузки обрезает файл до контрольной точки."""
+        complete = self.path('complete.jsonl')
+        call_command('export_data', 'posts', output=complete,
+                     stderr=StringIO())
+        with open(complete, 'rb') as file:
+            lines = file.readlines()
+        output = self.path('resumed.jsonl')
+        with open(output, 'wb') as file:
+            file.writelines(lines[:2])
+            offset = file.tell()
+            file.write(b'{"id": 999, "te')
+        checkpoint = self.path('export.checkpoint')
+        with open(checkpoint, 'w') as file:
+            file.write(f'{json.loads(lines[1])["id"]} {offset}')
+        call_command('export_data', 'posts', output=output,
+                     checkpoint=checkpoint, stderr=StringIO())
+        with open(output, 'rb') as file:
+            self.assertEqual(file.readlines(), lines)
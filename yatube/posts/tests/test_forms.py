@@ -4,15 +4,17 @@ import tempfile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.conf import settings
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 from posts.models import Comment, Group, Post, User
+from posts.thumbnails import rendition_name
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, JOBS_EAGER=True)
 class PostFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -83,6 +85,18 @@ class PostFormTests(TestCase):
                 image='posts/small3.gif',
             ).exists())
 
+    def test_image_renditions_are_prepared(self):
+        """Копии картинки нарезаны при загрузке и выводятся в ленте"""
+        card = rendition_name(self.post.image.name, 'card')
+        self.assertTrue(default_storage.exists(card))
+        response = self.guest_client.get(reverse('yatube_posts:index'))
+        self.assertContains(response, default_storage.url(card))
+
+    def test_rendition_names_keep_source_extension(self):
+        """Картинки с одним именем и разными расширениями не смешиваются"""
+        self.assertNotEqual(rendition_name('posts/photo.png', 'card'),
+                            rendition_name('posts/photo.gif', 'card'))
+
     def test_edit_post(self):
         """Проверка формы редактировная поста"""
         posts_count = Post.objects.count()
@@ -173,10 +187,11 @@ class CommentFormTests(TestCase):
                 text='Тестовый коммент',
             ).exists())
 
+        # После редиректа страница уже в общем кэше: проверяем разметку.
         response = self.authorized_client.get(reverse(
             'yatube_posts:post_detail',
             kwargs={'post_id': self.post.id}))
-        self.assertTrue(len(response.context['post_comments']) > 0)
+        self.assertContains(response, self.text)
 
     def test_guest_cant_comment(self):
         """Проверка что гостевой клиент не имеет прав
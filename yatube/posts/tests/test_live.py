@@ -0,0 +1,142 @@
+import asyncio
+import json
+
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from posts import events
+from posts.live import LiveServer
+from posts.models import Comment, Group, Post, User
+
+
+class EventBusTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Группа', slug='test-slug', description='Описание')
+
+    def test_publish_skips_already_seen_ids(self):
+        bus, received = events.EventBus(), []
+        bus.subscribe(received.append)
+        event = events.post_event(5, self.user.pk, None)
+        self.assertTrue(bus.publish(event))
+        self.assertFalse(bus.publish(event))
+        self.assertTrue(bus.publish(events.comment_event(1, 5)))
+        self.assertEqual(len(received), 2)
+
+    def test_since_returns_delta_after_cursor(self):
+        first = Post.objects.create(author=self.user, text='Первая')
+        cursor = events.latest_cursor()
+        second = Post.objects.create(author=self.user, text='Вторая',
+                                     group=self.group)
+        comment = Comment.objects.create(post=first, author=self.user,
+                                         text='Комментарий')
+        delta = events.since(cursor)
+        self.assertEqual([(event.kind, event.id) for event in delta],
+                         [('post', second.pk), ('comment', comment.pk)])
+        self.assertIn(f'group:{self.group.pk}', delta[0].channels)
+        self.assertEqual(delta[1].channels, {f'post:{first.pk}'})
+
+
+class LiveServerTest(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(author=self.user, text='Запись')
+
+    async def open(self, port, channels, last_event_id=None, origin=None):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        request = f'GET /events/?channels={channels} HTTP/1.1\r\n'
+        if last_event_id:
+            request += f'Last-Event-ID: {last_event_id}\r\n'
+        if origin:
+            request += f'Origin: {origin}\r\n'
+        writer.write((request + '\r\n').encode())
+        self.head = await reader.readuntil(b'\r\n\r\n')
+        self.assertIn(b'text/event-stream', self.head)
+        await reader.readuntil(b'\n\n')
+        return reader, writer
+
+    async def next_event(self, reader):
+        frame = await asyncio.wait_for(reader.readuntil(b'\n\n'), 5)
+        fields = dict(line.split(': ', 1)
+                      for line in frame.decode().strip().split('\n'))
+        return fields['event'], json.loads(fields['data']), fields['id']
+
+    def run_server(self, scenario):
+        async def main():
+            live = LiveServer(poll_interval=0.05, keepalive=5)
+            server = await live.start('127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                return await scenario(port)
+            finally:
+                # Даём обработчикам заметить отключение клиентов.
+                for _ in range(100):
+                    if not live.clients:
+                        break
+                    await asyncio.sleep(0.01)
+                live.poller.cancel()
+                server.close()
+                await server.wait_closed()
+        return asyncio.run(main())
+
+    def test_saves_are_pushed_to_subscribed_channels(self):
+        """Новая запись и комментарий приходят в свои каналы."""
+        async def scenario(port):
+            feed, feed_writer = await self.open(port, 'index')
+            detail, detail_writer = await self.open(
+                port, f'post:{self.post.pk}')
+            post = await asyncio.to_thread(
+                Post.objects.create, author=self.user, text='Новая')
+            self.assertEqual((await self.next_event(feed))[:2],
+                             ('post', {'id': post.pk,
+                                       'author': self.user.pk,
+                                       'group': None}))
+            comment = await asyncio.to_thread(
+                Comment.objects.create, post=self.post, author=self.user,
+                text='Комментарий')
+            event, data, _ = await self.next_event(detail)
+            self.assertEqual((event, data['id']), ('comment', comment.pk))
+            for writer in (feed_writer, detail_writer):
+                writer.close()
+
+        self.run_server(scenario)
+
+    @override_settings(SSE_ALLOWED_ORIGINS=['http://localhost:8000'])
+    def test_stream_sends_cors_headers_to_allowed_origin(self):
+        """Поток с другого origin разрешён через CORS с учётными данными."""
+        async def scenario(port):
+            heads = []
+            for origin in ('http://localhost:8000', 'http://evil.test'):
+                _, writer = await self.open(port, 'index', origin=origin)
+                heads.append(self.head.decode())
+                writer.close()
+            return heads
+
+        allowed, other = self.run_server(scenario)
+        self.assertIn('200 OK', allowed)
+        self.assertIn(
+            'Access-Control-Allow-Origin: http://localhost:8000', allowed)
+        self.assertIn('Access-Control-Allow-Credentials: true', allowed)
+        self.assertNotIn('Access-Control-Allow-Origin', other)
+
+    def test_poller_and_reconnect_deliver_delta(self):
+        """Записи других процессов находит опрос, пропущенные — since."""
+        async def scenario(port):
+            feed, writer = await self.open(port, 'index')
+            # bulk_create не шлёт сигналов — как запись из процесса WSGI.
+            await asyncio.to_thread(Post.objects.bulk_create, [
+                Post(author=self.user, text='Из другого процесса')])
+            _, data, last_id = await self.next_event(feed)
+            writer.close()
+            missed = await asyncio.to_thread(
+                Post.objects.create, author=self.user, text='Пропущенная')
+            feed, writer = await self.open(port, 'index', last_id)
+            _, replayed, _ = await self.next_event(feed)
+            writer.close()
+            return data['id'], replayed['id'], missed.pk
+
+        first, replayed, missed = self.run_server(scenario)
+        self.assertGreater(first, self.post.pk)
+        self.assertEqual(replayed, missed)
@@ -1,6 +1,11 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
 
-from ..models import Group, Post, User
+from .. import stats
+from ..models import AuthorStats, Comment, Follow, Group, Post, User
 
 
 class PostModelTest(TestCase):
@@ -49,6 +54,17 @@ class PostModelTest(TestCase):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, expected_value)
 
+    def test_save_keeps_comments_count(self):
+        """Сохранение устаревшего экземпляра не затирает счётчик."""
+        post = Post.objects.create(author=self.user, text='Пост')
+        stale = Post.objects.get(pk=post.pk)
+        Comment.objects.create(author=self.user, post=post, text='Коммент')
+        stale.text = 'Исправленный пост'
+        stale.save()
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Исправленный пост')
+        self.assertEqual(post.comments_count, 1)
+
 
 class GroupModelTest(TestCase):
     @classmethod
@@ -65,3 +81,97 @@ class GroupModelTest(TestCase):
         groupname = GroupModelTest.group
         expected_object_name = groupname
         self.assertEqual(str(expected_object_name), 'Тестовая группа')
+
+
+class AuthorStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def test_counters_follow_signals(self):
+        """Счётчики меняются сигналами без пересчёта."""
+        self.assertEqual(stats.for_author(self.user).posts_count, 0)
+        stats.for_author(self.reader)
+        post = Post.objects.create(author=self.user, text='Пост')
+        Comment.objects.create(author=self.user, post=post, text='Коммент')
+        Follow.objects.create(user=self.reader, author=self.user)
+        author_stats = AuthorStats.objects.get(author=self.user)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.comments_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.reader).following_count, 1)
+        post.delete()
+        author_stats.refresh_from_db()
+        self.assertEqual(author_stats.posts_count, 0)
+        self.assertEqual(author_stats.comments_count, 0)
+
+    def test_user_delete_does_not_recreate_stats(self):
+        """Каскадное удаление автора не оставляет строку статистики."""
+        author = User.objects.create_user(username='gone')
+        Post.objects.create(author=author, text='Пост')
+        stats.for_author(author)
+        author.delete()
+        self.assertFalse(AuthorStats.objects.filter(author_id=author.pk))
+
+    def test_reconcile_command_repairs_drift(self):
+        """reconcile_author_stats чинит разошедшиеся счётчики."""
+        Post.objects.create(author=self.user, text='Пост')
+        stats.for_author(self.user)
+        AuthorStats.objects.filter(author=self.user).update(posts_count=42)
+        call_command('reconcile_author_stats', stdout=StringIO())
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.user).posts_count, 1)
+        self.assertTrue(AuthorStats.objects.filter(author=self.reader))
+
+
+class FeedIndexTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_feeds_read_posts_by_index(self):
+        """Ленты идут по индексу, без полного скана и сортировки."""
+        feeds = {
+            'index': Post.objects.for_feed(),
+            'profile': self.user.posts.for_feed(),
+            'group': self.group.group_posts.for_feed(),
+        }
+        for name, queryset in feeds.items():
+            with self.subTest(feed=name):
+                plan = self.query_plan(queryset[:10])
+                self.assertFalse(
+                    [step for step in plan if 'posts_post' in step
+                     and 'INDEX' not in step], plan)
+                self.assertFalse(
+                    [step for step in plan if 'TEMP B-TREE' in step], plan)
+
+    def test_follow_feed_searches_posts_by_author_index(self):
+        """Лента подписок ищет записи по индексу (author, pub_date)."""
+        queryset = Post.objects.filter(
+            author__following__user=self.reader).for_feed()
+        plan = self.query_plan(queryset[:10])
+        self.assertIn('post_author_pub_date_idx',
+                      ' '.join(step for step in plan if 'posts_post' in step))
+
+    def test_follow_pair_is_unique(self):
+        """Повторная подписка на того же автора запрещена базой."""
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.user)
+        self.assertEqual(Follow.objects.count(), 1)
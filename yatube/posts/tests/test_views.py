@@ -1,19 +1,33 @@
 import shutil
 import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
 
 from django.test import Client, TestCase, override_settings
 from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.urls import reverse
+from django.urls import reverse, reverse_lazy
 from django import forms
 from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
-from posts.models import Follow, Group, Post, User
+from core.models import Job
+from posts import counting, pagecache, stats, timeline, trending
+from posts.models import (Comment, Follow, Group, Post, TrendingScore,
+                          User)
+from posts.paginators import page_window
+from posts.tests.utils import QueryBudgetMixin
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, JOBS_EAGER=True)
 class PostURLTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -57,6 +71,8 @@ class PostURLTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        # Страницы с теми же адресами могли остаться в кэше от других тестов.
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -180,20 +196,20 @@ class PostURLTests(TestCase):
                 self.assertIsInstance(form_field, expected)
 
     def test_cache_index_page(self):
-        """Проверка кэширование записей на главной странице"""
-        response_before = self.authorized_client.get(
-            reverse('yatube_posts:index'))
-        posts_before = response_before.content
-        self.post.delete()
-        response_after = self.authorized_client.get(
-            reverse('yatube_posts:index'))
-        posts_after = response_after.content
-        self.assertEqual(posts_before, posts_after)
+        """Карточки записей кэшируются и сбрасываются при изменении записи"""
         cache.clear()
-        response_clear = self.authorized_client.get(
-            reverse('yatube_posts:index'))
-        posts_clear = response_clear.content
-        self.assertNotEqual(posts_before, posts_clear)
+        url = reverse('yatube_posts:index')
+        self.authorized_client.get(url)
+        # Изменение в обход сигналов не видно: карточка взята из кэша.
+        Post.objects.filter(pk=self.post.pk).update(text='Обновлённый')
+        self.assertContains(self.authorized_client.get(url), 'Тестовая пост')
+        self.post.text = 'Обновлённый'
+        self.post.save()
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Обновлённый')
+        self.assertNotContains(response, 'Тестовая пост')
+        self.post.delete()
+        self.assertNotContains(self.authorized_client.get(url), 'Обновлённый')
 
 
 class FollowViewTests(TestCase):
@@ -312,3 +328,675 @@ class PaginatorViewsTest(TestCase):
             'yatube_posts:group_posts',
             kwargs={'slug': 'test-slug'}) + '?page=2')
         self.assertEqual(len(response.context['page_obj']), 3)
+
+
+class WindowedPaginatorTest(TestCase):
+
+    def test_page_window(self):
+        """Окно содержит края и соседей текущей страницы."""
+        self.assertEqual(page_window(1, 5), [1, 2, 3, 4, 5])
+        self.assertEqual(page_window(1, 100), [1, 2, 3, None, 100])
+        self.assertEqual(page_window(50, 100),
+                         [1, None, 48, 49, 50, 51, 52, None, 100])
+        self.assertEqual(page_window(99, 100),
+                         [1, None, 97, 98, 99, 100])
+
+    def test_paginator_renders_only_window(self):
+        """Паджинатор не выводит ссылку на каждую страницу."""
+        user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(author=user, text=f'Пост {i}') for i in range(120))
+        response = self.client.get(reverse('yatube_posts:index'),
+                                   {'page': 6})
+        self.assertContains(response, '?page=12"')
+        self.assertContains(response, '?page=4"')
+        self.assertNotContains(response, '?page=9"')
+        self.assertContains(response, '…', count=2)
+
+
+@override_settings(POSTS_EXACT_COUNT_THRESHOLD=5)
+class FeedCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(12):
+            Post.objects.create(author=cls.user, group=cls.group,
+                                text=f'Пост {i}')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_small_feed_is_counted_exactly(self):
+        """Короткая лента считается точно и без кэша."""
+        posts = Post.objects.filter(author=self.user)[:3]
+        queryset = Post.objects.filter(pk__in=[post.pk for post in posts])
+        self.assertEqual(counting.feed_count(queryset, 'test'), (3, False))
+
+    def test_large_feed_count_is_cached_and_reset(self):
+        """Длинная лента считается один раз, новая запись сбрасывает кэш."""
+        scope = f'group:{self.group.pk}'
+        queryset = self.group.group_posts.all()
+        self.assertEqual(counting.feed_count(queryset, scope), (12, False))
+        with self.assertNumQueries(1):
+            self.assertEqual(counting.feed_count(queryset, scope),
+                             (12, False))
+        Post.objects.create(author=self.user, group=self.group, text='Ещё')
+        self.assertEqual(counting.feed_count(queryset, scope), (13, False))
+
+    def test_index_count_is_estimated_from_statistics(self):
+        """После ANALYZE главная берёт оценку и пишет «примерно»."""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        response = self.client.get(reverse('yatube_posts:index'))
+        paginator = response.context['page_obj'].paginator
+        self.assertTrue(paginator.count_is_estimate)
+        self.assertEqual(paginator.estimated_count, 12)
+        self.assertContains(response, 'примерно 2 стр.')
+
+    def test_stale_estimate_does_not_limit_navigation(self):
+        """Заниженная оценка не обрезает ленту на последней странице."""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Новый {i}') for i in range(20))
+        cache.clear()
+        url = reverse('yatube_posts:index')
+        page_obj = self.client.get(url, {'page': 3}).context['page_obj']
+        self.assertEqual(page_obj.number, 3)
+        self.assertEqual(len(page_obj), 10)
+        self.assertTrue(page_obj.has_next())
+        page_obj = self.client.get(url, {'page': 4}).context['page_obj']
+        self.assertEqual(page_obj.number, 4)
+        self.assertEqual(len(page_obj), 2)
+        self.assertFalse(page_obj.has_next())
+        page_obj = self.client.get(url, {'page': 9}).context['page_obj']
+        self.assertEqual(page_obj.number, 4)
+
+
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        for i in range(1, 14):
+            Post.objects.create(author=cls.user, text=f'Тестовая пост {i}')
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    @override_settings(POSTS_CURSOR_PAGINATION=True)
+    def test_cursor_pages_walk_the_feed(self):
+        """Курсоры next/prev обходят ленту без пропусков и повторов."""
+        url = reverse('yatube_posts:profile', kwargs={'username': 'auth'})
+        first = self.client.get(url).context['page_obj']
+        self.assertTrue(first.is_cursor)
+        self.assertEqual(len(first), 10)
+        self.assertFalse(first.has_previous())
+        second = self.client.get(
+            url + f'?after={first.next_cursor}').context['page_obj']
+        self.assertEqual(len(second), 3)
+        self.assertFalse(second.has_next())
+        self.assertEqual(
+            {post.pk for post in first} & {post.pk for post in second},
+            set())
+        back = self.client.get(
+            url + f'?before={second.previous_cursor}').context['page_obj']
+        self.assertEqual([post.pk for post in back],
+                         [post.pk for post in first])
+
+    def test_page_number_is_fallback(self):
+        """?page=N работает как прежде, битый курсор не ломает страницу."""
+        response = self.client.get(reverse('yatube_posts:index') + '?page=2')
+        self.assertEqual(len(response.context['page_obj']), 3)
+        response = self.client.get(
+            reverse('yatube_posts:index') + '?after=broken')
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+
+@override_settings(POSTS_TIMELINE_ENABLED=True,
+                   POSTS_TIMELINE_PROLIFIC_THRESHOLD=3)
+class TimelineViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.prolific = User.objects.create_user(username='prolific')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.prolific)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed_ids(self):
+        response = self.client.get(reverse('yatube_posts:follow_index'))
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_new_post_is_pushed_to_built_timeline(self):
+        """Новая запись попадает в уже собранную ленту подписчика."""
+        self.assertEqual(self.feed_ids(), [])
+        post = Post.objects.create(author=self.author, text='Новая')
+        # В TestCase on_commit не срабатывает, разносим запись вручную.
+        timeline.fan_out(post)
+        self.assertEqual(self.feed_ids(), [post.pk])
+
+    def test_fan_out_reads_posts_counter(self):
+        """Плодовитость автора берётся из AuthorStats без COUNT(*)."""
+        stats.for_author(self.author)
+        posts = [Post.objects.create(author=self.author, text=str(i))
+                 for i in range(3)]
+        with CaptureQueriesContext(connection) as queries:
+            timeline.fan_out(posts[-1])
+        self.assertFalse([query['sql'] for query in queries
+                          if 'COUNT(' in query['sql']])
+        self.assertIn(self.author.pk, timeline.prolific_authors())
+
+    def test_prolific_author_is_merged_on_read(self):
+        """Записи плодовитого автора подмешиваются при чтении."""
+        posts = [Post.objects.create(author=self.prolific, text=str(i))
+                 for i in range(4)]
+        self.assertEqual(self.feed_ids(),
+                         sorted((post.pk for post in posts), reverse=True))
+
+    def test_concurrent_pushes_keep_every_post(self):
+        """Параллельные fan-out в одну ленту не теряют записи."""
+        key = timeline.timeline_key(self.reader.pk)
+        cache.set(key, [], None)
+        threads = [threading.Thread(target=timeline.push, args=(key, pk))
+                   for pk in range(1, 21)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(cache.get(key)), list(range(1, 21)))
+
+    def test_merge_is_ordered_by_pub_date(self):
+        """Подмешанные записи идут по дате публикации, а не по id."""
+        posts = [Post.objects.create(author=self.prolific, text=str(i))
+                 for i in range(3)]
+        own = Post.objects.create(author=self.author, text='Своя')
+        Post.objects.filter(pk=posts[-1].pk).update(
+            pub_date=own.pub_date - timedelta(days=1))
+        self.assertEqual(self.feed_ids(),
+                         [own.pk, posts[1].pk, posts[0].pk, posts[2].pk])
+
+    def test_backfill_command_builds_timelines(self):
+        """backfill_timelines собирает ленты всех подписчиков."""
+        post = Post.objects.create(author=self.author, text='Старая')
+        call_command('backfill_timelines', stdout=StringIO())
+        self.assertEqual(cache.get(timeline.timeline_key(self.reader.pk)),
+                         [post.pk])
+
+
+class QueryBudgetViewsTest(QueryBudgetMixin, TestCase):
+    # Бюджеты для холодного кэша; включают сессию, пользователя запроса
+    # и поиск объекта по индексу для ETag.
+    BUDGETS = {
+        reverse_lazy('yatube_posts:index'): 4,
+        reverse_lazy('yatube_posts:group_posts',
+                     kwargs={'slug': 'test-slug'}): 6,
+        reverse_lazy('yatube_posts:profile',
+                     kwargs={'username': 'auth'}): 7,
+        reverse_lazy('yatube_posts:post_detail',
+                     kwargs={'post_id': 1}): 6,
+        reverse_lazy('yatube_posts:follow_index'): 4,
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        for i in range(1, 13):
+            Post.objects.create(
+                id=i, author=cls.user, group=group, text=f'Пост {i}')
+        for i in range(5):
+            commentator = User.objects.create_user(username=f'user{i}')
+            Comment.objects.create(
+                post_id=1, author=commentator,
+                text=f'Комментарий {i}')
+        stats.reconcile(cls.user.pk)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_views_fit_query_budget(self):
+        """Страницы не делают запросов на каждую запись или комментарий."""
+        for url, budget in self.BUDGETS.items():
+            with self.subTest(url=url):
+                cache.clear()
+                self.assertQueryBudget(self.client, url, budget)
+
+
+class ConditionalGetViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def revalidate(self, url, client=None):
+        client = client or self.client
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_index_is_not_modified(self):
+        """Повторный запрос без изменений — 304 без запросов к базе."""
+        url = reverse('yatube_posts:index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_post_detail_changes_with_comments(self):
+        """Новый комментарий делает страницу записи изменённой."""
+        url = reverse('yatube_posts:post_detail',
+                      kwargs={'post_id': self.post.pk})
+        self.assertEqual(self.revalidate(url).status_code, 304)
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Комментарий')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_etag_depends_on_viewer_and_follow_state(self):
+        """Вариант с кнопкой подписки не совпадает с анонимным."""
+        url = reverse('yatube_posts:profile', kwargs={'username': 'auth'})
+        anonymous_etag = self.client.get(url)['ETag']
+        self.client.force_login(self.reader)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=anonymous_etag)
+        self.assertEqual(response.status_code, 200)
+        reader_etag = response['ETag']
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_NONE_MATCH=reader_etag).status_code, 304)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_NONE_MATCH=reader_etag).status_code, 200)
+
+    def test_moved_post_changes_previous_group_page(self):
+        """Перенос записи в другую группу меняет страницу прежней."""
+        group = Group.objects.create(title='Группа', slug='first',
+                                     description='Описание')
+        Group.objects.create(title='Другая', slug='second',
+                             description='Описание')
+        self.post.group = group
+        self.post.save()
+        url = reverse('yatube_posts:group_posts', kwargs={'slug': 'first'})
+        etag = self.client.get(url)['ETag']
+        self.post.group = Group.objects.get(slug='second')
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+
+class SharedPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Пост')
+        stats.reconcile(cls.author.pk)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_anonymous_page_is_served_from_cache(self):
+        """Повторная страница для анонима не трогает базу."""
+        url = reverse('yatube_posts:post_detail',
+                      kwargs={'post_id': self.post.pk})
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Пост')
+
+    def test_writes_purge_dependent_pages(self):
+        """Комментарий и правка группы сбрасывают свои страницы."""
+        detail = reverse('yatube_posts:post_detail',
+                         kwargs={'post_id': self.post.pk})
+        group = reverse('yatube_posts:group_posts',
+                        kwargs={'slug': 'test-slug'})
+        self.client.get(detail)
+        self.client.get(group)
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Свежий комментарий')
+        self.assertContains(self.client.get(detail), 'Свежий комментарий')
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertContains(self.client.get(group), 'Новое название')
+
+    def test_pinned_request_bypasses_cache_and_etag(self):
+        """После своей записи страница собирается заново и без 304."""
+        url = reverse('yatube_posts:index')
+        etag = self.client.get(url)['ETag']
+        self.client.cookies[settings.REPLICA_PIN_COOKIE] = repr(time.time())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('page_obj', response.context)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_messages_cookie_bypasses_cache(self):
+        """С flash-сообщениями страница собирается заново."""
+        url = reverse('yatube_posts:index')
+        self.client.get(url)
+        self.client.cookies['messages'] = 'pending'
+        response = self.client.get(url)
+        self.assertIn('page_obj', response.context)
+
+    def test_warm_command_fills_cache(self):
+        """warm_page_cache заранее сохраняет популярные страницы."""
+        out = StringIO()
+        call_command('warm_page_cache', top=4, allow_local=True, stdout=out)
+        self.assertIn('Прогрето страниц: 4', out.getvalue())
+        with self.assertNumQueries(0):
+            self.client.get(reverse('yatube_posts:profile',
+                                    kwargs={'username': 'auth'}))
+
+    def test_warm_command_refuses_process_local_cache(self):
+        """Без общего кэша прогрев отказывается работать."""
+        with self.assertRaises(CommandError):
+            call_command('warm_page_cache', top=4, stdout=StringIO())
+        self.assertIsNone(cache.get(pagecache.page_key(
+            reverse('yatube_posts:index'))))
+
+
+class PersonalFragmentsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other = User.objects.create_user(username='other')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def client_for(self, user):
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def test_shared_page_gets_personal_fragments(self):
+        """Общая страница профиля, кнопка подписки — своя у каждого."""
+        url = reverse('yatube_posts:profile', kwargs={'username': 'auth'})
+        response = self.client_for(self.reader).get(url)
+        self.assertContains(response, 'Отписаться')
+        self.assertContains(response, 'Пользователь: reader')
+        client = self.client_for(self.other)
+        # Сессия, пользователь и проверка подписки; лента — из кэша.
+        with self.assertNumQueries(3):
+            response = client.get(url)
+        self.assertContains(response, 'Подписаться')
+        self.assertContains(response, 'Пользователь: other')
+        self.assertNotContains(response, '<!--hole:')
+        response = Client().get(url)
+        self.assertNotContains(response, 'Подписаться')
+        self.assertContains(response, 'Войти')
+
+    def test_comment_form_is_rendered_per_request(self):
+        """Форма комментария есть только у вошедших, с их CSRF."""
+        url = reverse('yatube_posts:post_detail',
+                      kwargs={'post_id': self.post.pk})
+        self.assertNotContains(Client().get(url), 'Добавить комментарий')
+        response = self.client_for(self.reader).get(url)
+        self.assertContains(response, 'Добавить комментарий')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+    def test_personal_endpoint(self):
+        """/personal/ отдаёт фрагменты для текущего пользователя."""
+        response = self.client_for(self.reader).get(
+            reverse('personal'), {'hole': ['follow_button:auth',
+                                           'comment_form:1']})
+        fragments = response.json()
+        self.assertIn('Отписаться', fragments['follow_button:auth'])
+        self.assertIn('Отправить', fragments['comment_form:1'])
+        self.assertEqual(response['Cache-Control'], 'private, no-store')
+
+    def test_switcher_does_not_leak_between_users(self):
+        """Вкладки ленты зависят от входа в любом порядке загрузки."""
+        url = reverse('yatube_posts:index')
+        follow_url = reverse('yatube_posts:follow_index')
+        for reader_first in (False, True):
+            cache.clear()
+            anonymous = Client().get(url)
+            reader = self.client_for(self.reader).get(url)
+            if reader_first:
+                anonymous = Client().get(url)
+            self.assertNotContains(anonymous, follow_url)
+            self.assertContains(reader, follow_url)
+
+
+@override_settings(JOBS_EAGER=True)
+class SearchViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.in_text = Post.objects.create(
+            author=cls.user, group=cls.group, text='Красивые котики спят')
+        cls.in_comment = Post.objects.create(
+            author=cls.user, text='Просто запись')
+        Comment.objects.create(
+            author=cls.user, post=cls.in_comment, text='Какой котик!')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def found(self, **params):
+        response = self.client.get(reverse('yatube_posts:search'), params)
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_search_uses_stems_and_ranks_text_above_comments(self):
+        """Поиск находит словоформы и выше ставит совпадения в тексте."""
+        self.assertEqual(self.found(q='котиком'),
+                         [self.in_text.pk, self.in_comment.pk])
+        self.assertEqual(self.found(q='красивый котик'), [self.in_text.pk])
+        self.assertEqual(self.found(q='собака'), [])
+
+    def test_repeated_search_does_not_count_posts(self):
+        """Вес терминов берёт число записей из кэша, а не из COUNT(*)."""
+        self.found(q='котик')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.found(q='котик'),
+                             [self.in_text.pk, self.in_comment.pk])
+        self.assertFalse([
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT COUNT(*)')
+            and 'FROM "posts_post"' in query['sql']])
+
+    def test_search_filters_and_updates_index(self):
+        """Фильтр по группе и обновление индекса при правке записи."""
+        self.assertEqual(self.found(q='котик', group='test-slug'),
+                         [self.in_text.pk])
+        self.in_text.text = 'Собаки'
+        self.in_text.save()
+        self.assertEqual(self.found(q='котик'), [self.in_comment.pk])
+
+    def test_search_cursor_pagination(self):
+        """Результаты поиска листаются курсором."""
+        for i in range(12):
+            Post.objects.create(author=self.user, text=f'Котик номер {i}')
+        url = reverse('yatube_posts:search')
+        first = self.client.get(url, {'q': 'котик'}).context['page_obj']
+        self.assertEqual(len(first), 10)
+        second = self.client.get(
+            url, {'q': 'котик', 'after': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second), 4)
+        self.assertFalse(second.has_next())
+
+
+@override_settings(JOBS_EAGER=True)
+class TrendingViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug',
+            description='Тестовое описание')
+        cls.quiet = Post.objects.create(author=cls.user, text='Тихая')
+        cls.hot = Post.objects.create(author=cls.user, text='Горячая',
+                                      group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def page_ids(self, url):
+        response = self.client.get(url)
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_comments_lift_post_site_wide_and_in_group(self):
+        """Комментарии поднимают запись в популярном сайта и группы."""
+        for i in range(3):
+            Comment.objects.create(post=self.hot, author=self.user,
+                                   text=f'Комментарий {i}')
+        self.assertEqual(self.page_ids(reverse('yatube_posts:trending')),
+                         [self.hot.pk, self.quiet.pk])
+        self.assertEqual(
+            self.page_ids(reverse('yatube_posts:group_trending',
+                                  kwargs={'slug': 'test-slug'})),
+            [self.hot.pk])
+
+    def test_older_events_decay(self):
+        """Событие через два периода полураспада весит как четыре старых."""
+        TrendingScore.objects.all().delete()
+        half_life = settings.POSTS_TRENDING_HALF_LIFE
+        for _ in range(3):
+            trending.record(self.quiet.pk, 'comment', 1000)
+        trending.record(self.hot.pk, 'comment', 1000 + half_life)
+        self.assertEqual(trending.top_ids(), [self.quiet.pk, self.hot.pk])
+        trending.record(self.hot.pk, 'comment', 1000 + 2 * half_life)
+        self.assertEqual(trending.top_ids(), [self.hot.pk, self.quiet.pk])
+
+    def test_reads_come_from_refreshed_top_list(self):
+        """Страница читает готовый top-K, а не таблицу рейтингов."""
+        trending.refresh()
+        with self.assertNumQueries(0):
+            trending.read(self.group.pk)
+
+    def test_eager_events_invalidate_cached_lists(self):
+        """Без очереди событие сбрасывает закэшированные списки."""
+        TrendingScore.objects.all().delete()
+        trending.record(self.quiet.pk, 'comment')
+        self.assertEqual(trending.read(), [self.quiet.pk])
+        self.assertEqual(trending.read(self.group.pk), [])
+        trending.record(self.hot.pk, 'follow')
+        self.assertEqual(trending.read(), [self.hot.pk, self.quiet.pk])
+        self.assertEqual(trending.read(self.group.pk), [self.hot.pk])
+
+    def test_follow_scores_latest_post_of_author(self):
+        """Подписка на автора засчитывается его последней записи."""
+        before = TrendingScore.objects.get(post=self.hot).score
+        Follow.objects.create(user=User.objects.create_user('reader'),
+                              author=self.user)
+        self.assertGreater(TrendingScore.objects.get(post=self.hot).score,
+                           before)
+
+    def test_refresh_is_scheduled_once_outside_writes(self):
+        """События ставят одну отложенную пересборку, а не выполняют её."""
+        with self.settings(JOBS_EAGER=False):
+            for _ in range(3):
+                trending.record(self.hot.pk, 'comment')
+        job = Job.objects.get(name=trending.refresh.task_name)
+        self.assertGreater(job.run_at, timezone.now())
+        # Выборка группы, строка рейтинга в точке сохранения — и всё.
+        with self.assertNumQueries(5):
+            trending.record(self.hot.pk, 'comment')
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Обсуждаемая')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(25))
+        stats.reconcile_comment_counts()
+        stats.reconcile(cls.user.pk)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_first_page_is_rendered_without_count(self):
+        """Первая порция в странице записи, число — из счётчика."""
+        url = reverse('yatube_posts:post_detail',
+                      kwargs={'post_id': self.post.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        page = response.context['post_comments']
+        self.assertEqual(len(page), 20)
+        self.assertTrue(page.has_next())
+        self.assertContains(response, 'Комментарии: 25')
+        self.assertFalse([query for query in queries
+                          if 'COUNT' in query['sql']
+                          and 'posts_comment' in query['sql']])
+
+    def test_next_pages_come_as_fragments(self):
+        """Продолжение приходит HTML-фрагментом или JSON по курсору."""
+        url = reverse('yatube_posts:post_comments',
+                      kwargs={'post_id': self.post.pk})
+        first = self.client.get(url)
+        self.assertContains(first, 'Показать ещё')
+        cursor = first.context['post_comments'].next_cursor
+        data = self.client.get(
+            url, {'after': cursor, 'format': 'json'}).json()
+        self.assertEqual([item['text'] for item in data['results']],
+                         [f'Комментарий {i}' for i in range(20, 25)])
+        self.assertIsNone(data['next'])
+
+    def test_counter_follows_comments(self):
+        """Счётчик меняется с комментариями и чинится пересчётом."""
+        comment = Comment.objects.create(post=self.post, author=self.user,
+                                         text='Ещё один')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 26)
+        comment.delete()
+        Post.objects.filter(pk=self.post.pk).update(comments_count=0)
+        self.assertEqual(stats.reconcile_comment_counts(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 25)
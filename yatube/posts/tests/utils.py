@@ -0,0 +1,21 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """Проверка, что страница укладывается в фиксированное число запросов.
+
+    Бюджет не зависит от количества записей и комментариев на странице,
+    поэтому любой N+1 в представлении или шаблоне роняет тест.
+    """
+
+    def assertQueryBudget(self, client, url, budget):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        executed = len(queries)
+        if executed > budget:
+            sql = '\n'.join(query['sql'] for query in queries.captured_queries)
+            self.fail(f'{url}: {executed} запросов при бюджете {budget}\n'
+                      f'{sql}')
+        return response
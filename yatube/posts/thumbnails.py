@@ -0,0 +1,97 @@
+"""Заранее нарезанные копии картинок записей (renditions).
+
+Копии всех размеров готовятся один раз после загрузки картинки фоновой
+задачей (core.jobs), а шаблоны ссылаются только на уже готовые файлы.
+Когда копии готовы, версия записи увеличивается, и закэшированная
+карточка перерисовывается уже с картинкой.
+"""
+import hashlib
+import logging
+from io import BytesIO
+
+from core import jobs
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from . import versions
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS = {
+    'card': {'size': (960, 339), 'format': 'JPEG', 'ext': 'jpg'},
+    'card_webp': {'size': (960, 339), 'format': 'WEBP', 'ext': 'webp'},
+    'preview': {'size': (320, 113), 'format': 'JPEG', 'ext': 'jpg'},
+}
+RENDITIONS_DIR = 'posts/renditions'
+
+
+def rendition_name(image_name, rendition):
+    """Имя копии по хэшу полного имени: photo.png и photo.gif не совпадут."""
+    digest = hashlib.sha1(image_name.encode()).hexdigest()
+    ext = RENDITIONS[rendition]['ext']
+    return f'{RENDITIONS_DIR}/{rendition}/{digest}.{ext}'
+
+
+def rendition_url(image_name, rendition):
+    """URL готовой копии или None, если её ещё нет."""
+    if not image_name:
+        return None
+    name = rendition_name(image_name, rendition)
+    if not default_storage.exists(name):
+        return None
+    return default_storage.url(name)
+
+
+def supported(rendition):
+    image_format = RENDITIONS[rendition]['format']
+    return image_format != 'WEBP' or features.check('webp')
+
+
+def missing_renditions(image_name):
+    return [
+        rendition for rendition in RENDITIONS
+        if supported(rendition)
+        and not default_storage.exists(rendition_name(image_name, rendition))
+    ]
+
+
+@jobs.task()
+def generate(image_name, force=False):
+    """Нарезает недостающие копии картинки и сбрасывает карточки записей."""
+    renditions = list(RENDITIONS) if force else missing_renditions(
+        image_name)
+    renditions = [name for name in renditions if supported(name)]
+    if not renditions:
+        return []
+    try:
+        with default_storage.open(image_name) as source:
+            image = Image.open(source)
+            image.load()
+    except (OSError, SuspiciousFileOperation):
+        logger.warning('Не удалось открыть картинку %s', image_name,
+                       exc_info=True)
+        return []
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    for rendition in renditions:
+        spec = RENDITIONS[rendition]
+        # Обрезка по центру с увеличением, как crop="center" upscale=True.
+        resized = ImageOps.fit(image, spec['size'], Image.LANCZOS)
+        buffer = BytesIO()
+        resized.save(buffer, spec['format'], quality=85)
+        name = rendition_name(image_name, rendition)
+        default_storage.delete(name)
+        default_storage.save(name, ContentFile(buffer.getvalue()))
+    for pk, author_id, group_id in Post.objects.filter(
+            image=image_name).values_list('id', 'author_id', 'group_id'):
+        versions.bump('post', pk)
+        versions.bump_feeds(author_id, group_id)
+    return renditions
+
+
+def schedule(image_name):
+    """Ставит нарезку в очередь и сразу возвращает управление."""
+    return generate.enqueue(image_name, dedup_key=f'renditions:{image_name}')
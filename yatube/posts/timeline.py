@@ -0,0 +1,142 @@
+"""Домашняя лента подписок, собираемая при записи (fan-out-on-write).
+
+Для каждого подписчика в кэше хранится ограниченный список id записей,
+новые записи проталкиваются в него при сохранении. Записи очень
+плодовитых авторов не разносятся по лентам, а подмешиваются при чтении
+в порядке (pub_date, id). Параллельные fan-out меняют одну ленту по
+очереди под блокировкой cache.add и не теряют id друг друга.
+"""
+import time
+
+from core import jobs, sqlite
+from django.conf import settings
+from django.core.cache import cache
+
+from . import stats
+from .models import AuthorStats, Follow, Post
+
+TIMELINE_KEY = 'timeline:{}'
+PROLIFIC_KEY = 'timeline:prolific'
+LOCK_KEY = 'timeline_lock:{}'
+# Сколько держится блокировка ленты, если процесс упал.
+LOCK_TIMEOUT = 5
+# Сколько ждать чужого fan-out, прежде чем сбросить ленту.
+WAIT_TIMEOUT = 1
+WAIT_STEP = 0.01
+
+
+def timeline_key(user_id):
+    return TIMELINE_KEY.format(user_id)
+
+
+def prolific_authors():
+    """Множество id авторов, чьи записи читаются без fan-out."""
+    authors = cache.get(PROLIFIC_KEY)
+    if authors is None:
+        # Авторов без строки статистики догонит fan_out их новой записи.
+        authors = set(AuthorStats.objects.filter(
+            posts_count__gte=settings.POSTS_TIMELINE_PROLIFIC_THRESHOLD)
+            .values_list('author_id', flat=True))
+        cache.set(PROLIFIC_KEY, authors, None)
+    return authors
+
+
+def followed_authors(user_id):
+    return set(Follow.objects.filter(user_id=user_id)
+               .values_list('author_id', flat=True))
+
+
+def latest_ids(author_ids):
+    return list(Post.objects.filter(author_id__in=author_ids)
+                .order_by('-pub_date', '-id')
+                .values_list('id', flat=True)
+                [:settings.POSTS_TIMELINE_LENGTH])
+
+
+def rebuild(user_id):
+    """Собирает ленту подписчика заново и кладёт её в кэш."""
+    authors = followed_authors(user_id) - prolific_authors()
+    ids = latest_ids(authors) if authors else []
+    cache.set(timeline_key(user_id), ids, None)
+    return ids
+
+
+def posts_count(author_id):
+    """Число записей автора из счётчика AuthorStats, а не COUNT(*)."""
+    count = AuthorStats.objects.filter(author_id=author_id).values_list(
+        'posts_count', flat=True).first()
+    if count is None:
+        count = stats.reconcile(author_id).posts_count
+    return count
+
+
+def fan_out(post):
+    """Проталкивает новую запись в уже собранные ленты подписчиков."""
+    author_id = post.author_id
+    authors = prolific_authors()
+    if author_id in authors:
+        return
+    if posts_count(author_id) >= settings.POSTS_TIMELINE_PROLIFIC_THRESHOLD:
+        authors.add(author_id)
+        cache.set(PROLIFIC_KEY, authors, None)
+        # Старые записи автора уже лежат в лентах, новые будут
+        # подмешиваться при чтении — ленты надо пересобрать.
+        invalidate_followers(author_id)
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    # Несобранные ленты не трогаем: они соберутся при чтении.
+    for key in cache.get_many([timeline_key(pk) for pk in follower_ids]):
+        push(key, post.pk)
+
+
+def push(key, post_id):
+    """Добавляет id в начало ленты под блокировкой этой ленты."""
+    lock_key = LOCK_KEY.format(key)
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            # Не дождались: пусть лента соберётся заново при чтении.
+            cache.delete(key)
+            return
+        time.sleep(WAIT_STEP)
+    try:
+        ids = cache.get(key)
+        if ids is not None and post_id not in ids:
+            ids.insert(0, post_id)
+            del ids[settings.POSTS_TIMELINE_LENGTH:]
+            cache.set(key, ids, None)
+    finally:
+        cache.delete(lock_key)
+
+
+@jobs.task()
+def fan_out_post(post_id):
+    post = Post.objects.filter(pk=post_id).only('id', 'author_id').first()
+    if post is not None:
+        fan_out(post)
+
+
+def invalidate(user_id):
+    sqlite.after_commit(lambda: cache.delete(timeline_key(user_id)))
+
+
+def invalidate_followers(author_id):
+    keys = [timeline_key(pk) for pk in Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)]
+    sqlite.after_commit(lambda: cache.delete_many(keys))
+
+
+def read(user_id):
+    """Возвращает id записей ленты, от новых к старым."""
+    ids = cache.get(timeline_key(user_id))
+    if ids is None:
+        ids = rebuild(user_id)
+    hot_authors = followed_authors(user_id) & prolific_authors()
+    if hot_authors:
+        merged = set(ids) | set(latest_ids(hot_authors))
+        return list(Post.objects.filter(pk__in=merged)
+                    .order_by('-pub_date', '-id')
+                    .values_list('id', flat=True)
+                    [:settings.POSTS_TIMELINE_LENGTH])
+    return ids[:settings.POSTS_TIMELINE_LENGTH]
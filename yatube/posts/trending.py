@@ -0,0 +1,116 @@
+"""Популярные записи: рейтинг с затуханием во времени.
+
+Каждое событие (новая запись, комментарий, подписка на автора) добавляет
+к рейтингу записи вес, который убывает вдвое за POSTS_TRENDING_HALF_LIFE
+секунд. Вместо того чтобы уменьшать все рейтинги со временем, вес
+события умножается на exp(lambda * t), а в базе хранится логарифм
+суммы: порядок записей от этого не меняется, и старые рейтинги не надо
+пересчитывать. Страница читает готовые top-K списков id из кэша, их
+пересобирает отложенная задача refresh.
+"""
+import math
+import time
+
+from core import jobs
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Post, TrendingScore
+
+WEIGHTS = {'post': 1.0, 'comment': 1.0, 'follow': 2.0}
+TOP_KEY = 'trending:{}'
+SITE = 'site'
+
+
+def top_key(scope):
+    return TOP_KEY.format(scope)
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def log_weight(weight, when):
+    decay = math.log(2) / settings.POSTS_TRENDING_HALF_LIFE
+    return math.log(weight) + decay * when
+
+
+def log_add(a, b):
+    """log(exp(a) + exp(b)) без переполнения."""
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+@jobs.task()
+def record(post_id, event, when=None):
+    """Добавляет событие к рейтингу записи."""
+    when = time.time() if when is None else when
+    groups = list(Post.objects.filter(pk=post_id).values_list(
+        'group_id', flat=True))
+    if not groups:
+        # Запись удалили, пока событие ждало в очереди.
+        return
+    group_id = groups[0]
+    value = log_weight(WEIGHTS[event], when)
+    with transaction.atomic():
+        row = TrendingScore.objects.select_for_update().filter(
+            post_id=post_id).first()
+        if row is None:
+            TrendingScore.objects.create(
+                post_id=post_id, group_id=group_id, score=value)
+        else:
+            row.score = log_add(row.score, value)
+            row.group_id = group_id
+            row.save(update_fields=['score', 'group'])
+    if not settings.JOBS_EAGER:
+        # Списки пересобирает одна отложенная задача на все события
+        # периода; без очереди она выполнялась бы на каждой записи.
+        refresh.enqueue(dedup_key='trending:refresh',
+                        delay=settings.POSTS_TRENDING_REFRESH)
+    else:
+        # Пересборки нет: списки соберутся заново при следующем чтении.
+        scopes = [SITE] if group_id is None else [SITE, group_scope(group_id)]
+        cache.delete_many([top_key(scope) for scope in scopes])
+
+
+def record_follow(author_id, when=None):
+    """Подписка засчитывается последней записи автора."""
+    post_id = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id').values_list('id', flat=True).first()
+    if post_id is not None:
+        record.enqueue(post_id, 'follow', when)
+
+
+def top_ids(group_id=None):
+    rows = TrendingScore.objects.order_by('-score', '-post_id')
+    if group_id is not None:
+        rows = rows.filter(group_id=group_id)
+    return list(rows.values_list('post_id', flat=True)
+                [:settings.POSTS_TRENDING_SIZE])
+
+
+@jobs.task()
+def refresh():
+    """Пересобирает top-K для сайта и для каждой группы с рейтингами."""
+    lists = {top_key(SITE): top_ids()}
+    group_ids = (TrendingScore.objects.exclude(group=None).order_by()
+                 .values_list('group_id', flat=True).distinct())
+    for group_id in group_ids:
+        lists[top_key(group_scope(group_id))] = top_ids(group_id)
+    cache.set_many(lists, None)
+    return len(lists)
+
+
+def read(group_id=None):
+    """id популярных записей, от самых горячих; список берётся из кэша."""
+    scope = SITE if group_id is None else group_scope(group_id)
+    ids = cache.get(top_key(scope))
+    if ids is None:
+        ids = top_ids(group_id)
+        # Срок жизни конечный: список, собранный при промахе, не должен
+        # пережить пересборку, даже если её некому поставить.
+        cache.set(top_key(scope), ids, settings.POSTS_TRENDING_REFRESH)
+    return ids
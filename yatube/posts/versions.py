@@ -0,0 +1,57 @@
+"""Версии объектов для ключей кэша.
+
+Кэшированные фрагменты не удаляются при изменении объекта: вместо этого
+увеличивается его версия, и старые ключи просто перестают запрашиваться.
+Если счётчик версии вытеснен из кэша, он заводится заново значением
+от текущего времени, поэтому старые ключи не оживают.
+"""
+import time
+
+from core import sqlite
+from django.core.cache import cache
+
+VERSION_KEY = 'version:{}:{}'
+
+
+def version_key(scope, pk):
+    return VERSION_KEY.format(scope, pk)
+
+
+def fresh_version():
+    return time.time_ns()
+
+
+def get_versions(pairs):
+    """Возвращает {(scope, pk): версия} для набора пар одним get_many."""
+    keys = {version_key(scope, pk): (scope, pk) for scope, pk in pairs}
+    found = cache.get_many(keys)
+    missing = {key: fresh_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {keys[key]: value for key, value in found.items()}
+
+
+def get_version(scope, pk):
+    return get_versions([(scope, pk)])[(scope, pk)]
+
+
+def bump(scope, pk):
+    # В пачке писателя версия растёт после фиксации: иначе читатель
+    # успел бы закэшировать прежние данные под новой версией.
+    sqlite.after_commit(lambda: increment(scope, pk))
+
+
+def increment(scope, pk):
+    try:
+        cache.incr(version_key(scope, pk))
+    except ValueError:
+        cache.set(version_key(scope, pk), fresh_version(), None)
+
+
+def bump_feeds(author_id, group_id):
+    """Отмечает изменение лент, в которые входит запись автора."""
+    bump('feed', 'index')
+    bump('feed', f'author:{author_id}')
+    if group_id:
+        bump('feed', f'group:{group_id}')
@@ -1,24 +1,75 @@
+from core import sqlite
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Follow, Group, Post, User
+from django.views.decorators.http import condition
+from .models import Comment, Follow, Group, Post, User
 from .forms import CommentForm, PostForm
+from .paginators import (CursorPage, CursorPaginator, WindowedPaginator,
+                         decode_cursor, encode_cursor, newer_than)
+from . import counting, search as search_index, stats, timeline, trending
+from .conditional import (group_etag, group_versions, index_etag,
+                          index_versions, post_etag, post_versions,
+                          profile_etag, profile_versions)
+from .pagecache import cache_shared_page
 
 
 MAX_POSTS = 10
+MAX_COMMENTS = 20
 
 
-def page_view(post_list, request):
-    paginator = Paginator(post_list, MAX_POSTS)
+def page_view(post_list, request, count=None, scope=None):
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if 'page' not in request.GET and (
+            after or before or settings.POSTS_CURSOR_PAGINATION):
+        paginator = CursorPaginator(post_list, MAX_POSTS)
+        return paginator.cursor_page(after=after, before=before)
+    paginator = WindowedPaginator(post_list, MAX_POSTS)
+    if count is None and scope is not None:
+        count, is_estimate = counting.feed_count(post_list, scope)
+        if is_estimate:
+            # Оценка только для подписи, границы страниц — по строкам.
+            paginator.estimated_count, count = count, None
+    if count is not None:
+        # Количество уже известно, полный COUNT(*) не нужен.
+        paginator.count = count
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
 
 
+def id_page_view(post_ids, request):
+    """Пагинирует готовый список id и подгружает только записи страницы."""
+    paginator = WindowedPaginator(post_ids, MAX_POSTS)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    posts = Post.objects.for_feed().in_bulk(page_obj.object_list)
+    page_obj.object_list = [posts[pk] for pk in page_obj.object_list
+                            if pk in posts]
+    return page_obj
+
+
+def comment_page(post_id, after=None):
+    """Комментарии от старых к новым с курсором на следующую порцию."""
+    comments = Comment.objects.filter(post_id=post_id).for_post()
+    position = decode_cursor(after or '')
+    if position is not None:
+        comments = newer_than(comments, position)
+    rows = list(comments[:MAX_COMMENTS + 1])
+    next_cursor = None
+    if len(rows) > MAX_COMMENTS:
+        rows = rows[:MAX_COMMENTS]
+        next_cursor = encode_cursor(rows[-1])
+    return CursorPage(rows, Paginator([], MAX_COMMENTS), next_cursor)
+
+
+@cache_shared_page(index_versions)
+@condition(etag_func=index_etag)
 def index(request):
-    post_list = (Post.objects.select_related('author', 'group')
-                 .order_by('-pub_date'))
-    page_obj = page_view(post_list, request)
+    post_list = Post.objects.for_feed()
+    page_obj = page_view(post_list, request, scope='index')
     context = {
         'page_obj': page_obj,
     }
@@ -30,11 +81,12 @@ def group_list(request):
     return render(request, template)
 
 
+@cache_shared_page(group_versions)
+@condition(etag_func=group_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = (group.group_posts.filter(group=group).
-                 select_related('author').order_by('-pub_date'))
-    page_obj = page_view(post_list, request)
+    post_list = group.group_posts.for_feed()
+    page_obj = page_view(post_list, request, scope=f'group:{group.pk}')
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -42,32 +94,48 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+def trending_posts(request):
+    context = {
+        'page_obj': id_page_view(trending.read(), request),
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+def group_trending(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    context = {
+        'group': group,
+        'page_obj': id_page_view(trending.read(group.pk), request),
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+@cache_shared_page(profile_versions)
+@condition(etag_func=profile_etag)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    author_count = author.posts.count()
-    post_list = author.posts.all()
-    page_obj = page_view(post_list, request)
-    following = None
-    if request.user.is_authenticated:
-        following = False
-        if Follow.objects.filter(user=request.user, author=author).exists():
-            following = True
+    author_stats = stats.for_author(author)
+    author_count = author_stats.posts_count
+    post_list = author.posts.for_feed()
+    page_obj = page_view(post_list, request, count=author_count)
     context = {
         'author': author,
         'page_obj': page_obj,
         'author_count': author_count,
+        'author_stats': author_stats,
         'posts': post_list,
-        'following': following
     }
     return render(request, 'posts/profile.html', context)
 
 
+@cache_shared_page(post_versions)
+@condition(etag_func=post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    author_count = post.author.posts.count()
+    post = get_object_or_404(Post.objects.for_detail(), pk=post_id)
+    author_count = stats.for_author(post.author).posts_count
     title = post.text[:30]
     form = CommentForm()
-    post_comments = post.comments.all()
+    post_comments = comment_page(post.pk)
 
     context = {
         'post': post,
@@ -78,6 +146,45 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+@condition(etag_func=post_etag)
+def post_comments(request, post_id):
+    """Следующая порция комментариев: HTML-фрагмент или ?format=json."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    page = comment_page(post_id, request.GET.get('after'))
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'results': [{
+                'id': comment.pk,
+                'author': comment.author.username,
+                'text': comment.text,
+                'pub_date': comment.pub_date,
+            } for comment in page],
+            'next': page.next_cursor,
+        })
+    return render(request, 'posts/includes/comments.html',
+                  {'post_id': post_id, 'post_comments': page})
+
+
+def search(request):
+    query = request.GET.get('q', '')
+    group = author = None
+    if request.GET.get('group'):
+        group = get_object_or_404(Group, slug=request.GET['group'])
+    if request.GET.get('author'):
+        author = get_object_or_404(User, username=request.GET['author'])
+    page_obj = search_index.search_page(
+        query, MAX_POSTS, after=request.GET.get('after'),
+        group=group, author=author)
+    context = {
+        'query': query,
+        'group': group,
+        'author': author,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 def post_create(request):
     TITLE = 'Новый пост'
     if request.method == "POST":
@@ -87,7 +194,7 @@ def post_create(request):
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
-            post.save()
+            sqlite.write(post.save)
             return redirect('yatube_posts:profile', request.user)
         return render(request, 'posts/create_post.html', {'form': form})
     form = PostForm()
@@ -109,7 +216,7 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        sqlite.write(form.save)
         return redirect('yatube_posts:post_detail', post_id=post_id)
     context = {
         'post': post,
@@ -127,18 +234,23 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        sqlite.write(comment.save)
     return redirect('yatube_posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
+    if settings.POSTS_TIMELINE_ENABLED:
+        post_ids = timeline.read(request.user.pk)
+        context = {
+            'page_obj': id_page_view(post_ids, request),
+        }
+        return render(request, 'posts/follow.html', context)
     followings = request.user.follower.all()
     follow_list = User.objects.filter(following__in=followings)
-    post_list = Post.objects.filter(
-        author__in=follow_list).select_related(
-        'author', 'group')
-    page_obj = page_view(post_list, request)
+    post_list = Post.objects.filter(author__in=follow_list).for_feed()
+    page_obj = page_view(post_list, request,
+                         scope=f'follow:{request.user.pk}')
     context = {
         'page_obj': page_obj,
     }
@@ -149,9 +261,9 @@ def follow_index(request):
 def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
-    if user != author and not Follow.objects.filter(
-            author=author, user=user).exists():
-        Follow.objects.create(author=author, user=user)
+    if user != author:
+        # Уникальность пары гарантирует база, повторный клик не задвоит.
+        sqlite.write(Follow.objects.get_or_create, author=author, user=user)
     return redirect('yatube_posts:profile', username=username)
 
 
@@ -159,5 +271,6 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
-    Follow.objects.get(author=author, user=user).delete()
+    follow = Follow.objects.get(author=author, user=user)
+    sqlite.write(follow.delete)
     return redirect('yatube_posts:profile', username=username)
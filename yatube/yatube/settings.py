@@ -4,9 +4,23 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.InstrumentedLocMemCache',
     }
 }
+# Общий для всех процессов кэш (core.cache.TieredCache) включается
+# переменной окружения; тесты остаются на изолированном LocMemCache.
+if os.getenv('YATUBE_SHARED_CACHE'):
+    CACHES['default'] = {
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': os.getenv('YATUBE_SHARED_CACHE'),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 200_000,
+            'L1_MAX_BYTES': 32 * 2 ** 20,
+            'L1_TIMEOUT': 60,
+            'POLL_INTERVAL': 0.5,
+        },
+    }
 
 SECRET_KEY = '=1gs^n^5pos#u788ix)y&&*^1@du8$7&!7z_kvj76od5&ey#)e'
 
@@ -30,13 +44,18 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'about.apps.AboutConfig',
     'core.apps.CoreConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Тесты пишут файлы во временный MEDIA_ROOT, а не в media/ проекта.
+TEST_RUNNER = 'core.test_runner.TempMediaRunner'
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,7 +69,7 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.InstrumentedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -60,6 +79,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.live.live_updates',
             ],
         },
     },
@@ -75,6 +95,39 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения (core.routers): YATUBE_REPLICAS — список
+# файлов через запятую. Локально это копии основной базы, которые
+# обновляет команда sync_replicas; в тестах реплики смотрят в default.
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+        filter(None, os.getenv('YATUBE_REPLICAS', '').split(','))):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Продакшен-профиль SQLite (core.sqlite): PRAGMA на каждом соединении
+# и один поток-писатель для записей из представлений.
+SQLITE_PRODUCTION = bool(os.getenv('YATUBE_SQLITE_PRODUCTION'))
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 2 ** 20,
+    'cache_size': -64_000,
+    'temp_store': 'MEMORY',
+}
+SQLITE_WRITE_QUEUE = SQLITE_PRODUCTION
+SQLITE_WRITE_BATCH = 50
+SQLITE_WRITE_TIMEOUT = 30
+# После записи чтения пользователя идут только на реплики, обновлённые
+# позже неё (или в основную базу), но не дольше этого срока.
+REPLICA_PIN_SECONDS = 60
+REPLICA_PIN_COOKIE = 'primary_pin'
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -106,9 +159,59 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
+# Ленты по умолчанию отдаются курсорами (?after=/?before=) вместо ?page=N.
+POSTS_CURSOR_PAGINATION = False
+
+# Лента подписок, собираемая при записи (posts.timeline).
+POSTS_TIMELINE_ENABLED = False
+POSTS_TIMELINE_LENGTH = 500
+# Авторы с таким числом записей подмешиваются в ленту при чтении.
+POSTS_TIMELINE_PROLIFIC_THRESHOLD = 1000
+
+# Время жизни отрисованной карточки записи (posts.cards), в секундах.
+POSTS_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Ленты длиннее порога не считаются COUNT(*) на каждый запрос
+# (posts.counting): берётся кэш или оценка.
+POSTS_EXACT_COUNT_THRESHOLD = 1000
+POSTS_COUNT_CACHE_TIMEOUT = 60 * 10
+
+# Входит в ETag страниц (posts.conditional): смена значения при выкладке
+# новых шаблонов не даст браузерам показывать старую разметку по 304.
+POSTS_ETAG_RELEASE = os.getenv('YATUBE_RELEASE', '')
+
+# Страницы для анонимов (posts.pagecache) сбрасываются версиями сразу,
+# таймаут лишь ограничивает место в кэше.
+POSTS_PAGE_CACHE_TIMEOUT = 60 * 10
+
+# Популярные записи (posts.trending): период полураспада веса события,
+# длина top-K и задержка пересборки списков после событий, в секундах.
+POSTS_TRENDING_HALF_LIFE = 60 * 60 * 12
+POSTS_TRENDING_SIZE = 100
+POSTS_TRENDING_REFRESH = 60
+
+# Живые обновления (posts.live, сервер python -m yatube.sse). SSE_URL —
+# адрес, по которому браузер откроет поток; пустой выключает обновления.
+SSE_URL = os.getenv('YATUBE_SSE_URL', '')
+SSE_PATH = '/events/'
+SSE_ALLOWED_ORIGINS = ['http://localhost:8000', 'http://127.0.0.1:8000']
+SSE_POLL_INTERVAL = 1.0
+SSE_KEEPALIVE = 15
+
+# Фоновые задачи (core.jobs) ждут воркера manage.py run_jobs. JOBS_EAGER
+# выполняет их сразу при постановке — только для тестов (override_settings).
+JOBS_EAGER = False
+JOBS_WORKERS = 2
+# Задача, взятая воркером дольше этого срока, считается брошенной.
+JOBS_LEASE = 60 * 10
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'yatube_posts:index'
 # LOGOUT_REDIRECT_URL = 'yatube_posts:index'
 
+# Метрики производительности (core.middleware, /metrics/).
+PERFORMANCE_SLOW_REQUEST_MS = 500
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
@@ -0,0 +1,35 @@
+"""
+SSE entry point for yatube project.
+
+Runs the asyncio Server-Sent Events server next to the WSGI application:
+
+    python -m yatube.sse --host 127.0.0.1 --port 8001
+
+Idle clients cost a coroutine each instead of a WSGI worker.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+django.setup()
+
+from posts.live import serve  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Yatube SSE server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == '__main__':
+    main()
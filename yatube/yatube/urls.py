@@ -3,12 +3,17 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import metrics_view, personal_view
+
 handler404 = 'core.views.page_not_found'
 handler403 = 'core.views.forbidden_error'
 handler500 = 'core.views.internal_server_error'
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/', metrics_view, name='metrics'),
+    path('personal/', personal_view, name='personal'),
+    path('api/', include('api.urls', namespace='api')),
     path('', include('posts.urls', namespace='yatube_posts')),
     path('group_list.html', include('posts.urls', namespace='yatube_posts')),
     path('about/', include('about.urls', namespace='about')),